@@ -0,0 +1,131 @@
+import json
+import pickle
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from timeit import default_timer
+from typing import List, Dict, Any, Optional
+
+
+logger = logging.getLogger('cache')
+
+
+class PredictionCache(object):
+    """
+    An in-process LRU cache of per-record predictions. Records are keyed on a
+    hash of `key_fields`, which default to the input fields of the pipeline.
+    Fields produced by a step (e.g. the output of a TextScrubber) can be used
+    as keys so that trivially different inputs share an entry, the steps up to
+    that field are then run for all records and the rest only for misses.
+
+    Entries are evicted once there are more than `max_entries` of them or
+    they take up more than `max_bytes`, and expire after `ttl` seconds. A
+    cache belongs to a single model, it's cleared whenever it's bound to a
+    different model configuration.
+    """
+    def __init__(
+            self,
+            key_fields: List[str] = None,
+            max_entries: int = 100000,
+            max_bytes: int = None,
+            ttl: float = None
+    ):
+        self._key_fields = key_fields
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._ttl = ttl
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._config_hash = None
+        self._counters = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'invalidations': 0}
+
+    @property
+    def key_fields(self) -> Optional[List[str]]:
+        return self._key_fields
+
+    @staticmethod
+    def hash_config(config: Dict[str, Any]) -> str:
+        return hashlib.sha1(json.dumps(config, sort_keys=True, default=str).encode()).hexdigest()
+
+    @staticmethod
+    def hash_records(obj: Dict[str, Any], fields: List[str]) -> List[str]:
+        columns = [list(obj[name]) for name in fields]
+        return [
+            hashlib.blake2b(pickle.dumps(values, protocol=4), digest_size=16).hexdigest()
+            for values in zip(*columns)
+        ]
+
+    def bind(self, config_hash: str) -> None:
+        with self._lock:
+            if config_hash == self._config_hash:
+                return
+
+            if self._config_hash is not None:
+                logger.info('Model configuration changed, invalidating the prediction cache')
+                self._counters['invalidations'] += 1
+
+            self._entries.clear()
+            self._bytes = 0
+            self._config_hash = config_hash
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._ttl is not None and entry[2] < default_timer():
+                self._remove(key)
+                self._counters['expirations'] += 1
+                entry = None
+
+            if entry is None:
+                self._counters['misses'] += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self._counters['hits'] += 1
+
+        # Entries are stored pickled, which keeps callers from modifying them
+        return pickle.loads(entry[0])
+
+    def put(self, key: str, value: Any) -> None:
+        data = pickle.dumps(value, protocol=4)
+        size = len(data) + len(key)
+        expires = default_timer() + self._ttl if self._ttl is not None else None
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (data, size, expires)
+            self._bytes += size
+
+            while self._entries and (
+                    len(self._entries) > self._max_entries or
+                    (self._max_bytes is not None and self._bytes > self._max_bytes)
+            ):
+                self._remove(next(iter(self._entries)))
+                self._counters['evictions'] += 1
+
+    def _remove(self, key: str) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._counters['hits'] + self._counters['misses']
+            return {
+                **self._counters,
+                'hit_rate': self._counters['hits'] / lookups if lookups else 0.0,
+                'entries': len(self._entries),
+                'bytes': self._bytes
+            }
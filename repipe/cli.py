@@ -0,0 +1,218 @@
+import os
+import sys
+import json
+import hashlib
+import logging
+import argparse
+import traceback
+import multiprocessing
+from functools import partial
+from timeit import default_timer
+from typing import List, Dict, Any, Iterator
+
+import joblib
+import pandas as pd
+
+from .utils import Timer
+from .serializeable import Serializable
+
+
+logger = logging.getLogger('cli')
+
+SUCCESS_MARKER = '_SUCCESS'
+
+# Set in the parent before forking the workers, which share it copy-on-write
+_pipeline = None
+
+
+def load_pipeline(path: str):
+    import yaml
+
+    with open(path, 'r') as f:
+        return Serializable.load(yaml.safe_load(f))
+
+
+def read_chunks(path: str, chunk_rows: int = None) -> Iterator[pd.DataFrame]:
+    ext = os.path.splitext(path)[1].lower()
+
+    if ext == '.csv':
+        reader = partial(pd.read_csv, path)
+    elif ext in ('.json', '.jsonl'):
+        reader = partial(pd.read_json, path, lines=True)
+    elif ext == '.parquet':
+        df = pd.read_parquet(path)
+        step = chunk_rows or max(len(df), 1)
+        for i in range(0, len(df), step):
+            yield df.iloc[i:i + step]
+        return
+    else:
+        raise ValueError(f'Unsupported input format: {path}')
+
+    if chunk_rows is None:
+        yield reader()
+    else:
+        yield from reader(chunksize=chunk_rows)
+
+
+def parse_bytes(size: str) -> int:
+    units = {'K': 2**10, 'M': 2**20, 'G': 2**30, 'T': 2**40}
+    size = size.strip().upper().rstrip('B')
+    if size and size[-1] in units:
+        return int(float(size[:-1]) * units[size[-1]])
+    return int(size)
+
+
+def plan_chunk_rows(path: str, memory_budget: int, sample_rows: int = 1000) -> int:
+    sample = next(read_chunks(path, sample_rows))
+    return _pipeline.plan(sample, memory_budget=memory_budget).recommend_chunk_size(memory_budget)
+
+
+def unit_name(path: str) -> str:
+    # The stem is suffixed with a hash of the path so that equally named
+    # files from different directories don't collide
+    stem = os.path.splitext(os.path.basename(path))[0]
+    digest = hashlib.sha1(os.path.abspath(path).encode()).hexdigest()[:8]
+    return f'{stem}-{digest}'
+
+
+def shard_units(paths: List[str], shard_index: int, shard_count: int) -> List[str]:
+    # Sorted so that every machine sees the same order
+    return [path for i, path in enumerate(sorted(paths)) if i % shard_count == shard_index]
+
+
+def transform_unit(path: str, output: str, chunk_rows: int = None, memory_budget: int = None) -> Dict[str, Any]:
+    out_dir = os.path.join(output, unit_name(path))
+    os.makedirs(out_dir, exist_ok=True)
+
+    # Parts left behind by an interrupted run are redone
+    for name in os.listdir(out_dir):
+        if name.startswith('part-'):
+            os.remove(os.path.join(out_dir, name))
+
+    try:
+        if chunk_rows is None and memory_budget is not None:
+            chunk_rows = plan_chunk_rows(path, memory_budget)
+
+        rows, parts = 0, 0
+        with Timer() as t:
+            for df in read_chunks(path, chunk_rows):
+                result = _pipeline.transform(df)
+
+                # Written under a temporary name, a part only exists once it's complete
+                part_path = os.path.join(out_dir, f'part-{parts:05d}.joblib')
+                joblib.dump(result, part_path + '.tmp')
+                os.replace(part_path + '.tmp', part_path)
+                rows += len(df)
+                parts += 1
+
+        summary = {'path': path, 'rows': rows, 'parts': parts, 'secs': t.elapsed_secs}
+        with open(os.path.join(out_dir, SUCCESS_MARKER), 'w') as f:
+            json.dump(summary, f)
+        return summary
+
+    except Exception:
+        return {'path': path, 'error': traceback.format_exc()}
+
+
+def is_done(path: str, output: str) -> bool:
+    return os.path.exists(os.path.join(output, unit_name(path), SUCCESS_MARKER))
+
+
+def format_secs(secs: float) -> str:
+    minutes, secs = divmod(int(secs), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f'{hours}:{minutes:02d}:{secs:02d}'
+
+
+def transform(args: argparse.Namespace) -> int:
+    global _pipeline
+
+    units = shard_units(args.inputs, args.shard_index, args.shard_count)
+    pending = [path for path in units if not is_done(path, args.output)]
+    print(f'Shard {args.shard_index}/{args.shard_count}: {len(units)} inputs, '
+          f'{len(units) - len(pending)} already done, {len(pending)} to transform')
+
+    if not pending:
+        return 0
+
+    _pipeline = load_pipeline(args.pipeline)
+    os.makedirs(args.output, exist_ok=True)
+
+    started = default_timer()
+    rows, failed = 0, []
+    workers = min(args.workers, len(pending))
+
+    # The budget is shared by the workers, each of which holds one chunk
+    memory_budget = args.memory_budget // workers if args.memory_budget else None
+    run = partial(transform_unit, output=args.output, chunk_rows=args.chunk_rows, memory_budget=memory_budget)
+
+    with multiprocessing.get_context('fork').Pool(workers) as pool:
+        for done, summary in enumerate(pool.imap_unordered(run, pending), start=1):
+            if 'error' in summary:
+                failed.append(summary['path'])
+                print(f'[{done}/{len(pending)}] {summary["path"]} failed:\n{summary["error"]}', file=sys.stderr)
+                continue
+
+            rows += summary['rows']
+            elapsed = default_timer() - started
+            eta = elapsed / done * (len(pending) - done)
+            print(f'[{done}/{len(pending)}] {summary["path"]}: {summary["rows"]} rows in '
+                  f'{summary["secs"]:.1f}s, {rows / elapsed:.0f} rows/s, ETA {format_secs(eta)}')
+
+    elapsed = default_timer() - started
+    print(f'Transformed {rows} rows from {len(pending) - len(failed)} inputs in {format_secs(elapsed)} '
+          f'({rows / elapsed:.0f} rows/s), {len(failed)} failed')
+    return 1 if failed else 0
+
+
+def plan(args: argparse.Namespace) -> int:
+    global _pipeline
+
+    _pipeline = load_pipeline(args.pipeline)
+    sample = next(read_chunks(args.input, args.sample_rows))
+    print(_pipeline.plan(sample, n_rows=args.rows, memory_budget=args.memory_budget))
+    return 0
+
+
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog='repipe', description='Runs saved re-pipe pipelines')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    cmd = commands.add_parser('transform', help='transforms input files with a saved pipeline')
+    cmd.add_argument('pipeline', help='pipeline YAML file')
+    cmd.add_argument('inputs', nargs='+', help='input files (.csv, .json/.jsonl as JSON lines, .parquet)')
+    cmd.add_argument('-o', '--output', required=True, help='output directory, one sub-directory per input')
+    cmd.add_argument('-w', '--workers', type=int, default=os.cpu_count(), help='number of worker processes')
+    cmd.add_argument('--shard-index', type=int, default=0, help='index of the shard to run on this machine')
+    cmd.add_argument('--shard-count', type=int, default=1, help='total number of shards')
+    cmd.add_argument('--chunk-rows', type=int, default=None, help='rows per output part, whole files if not set')
+    cmd.add_argument('--memory-budget', type=parse_bytes, default=None,
+                     help='memory shared by the workers (e.g. 16G), used to plan --chunk-rows if not set')
+    cmd.set_defaults(func=transform)
+
+    cmd = commands.add_parser('plan', help='estimates the output, memory use and time of a pipeline')
+    cmd.add_argument('pipeline', help='pipeline YAML file')
+    cmd.add_argument('input', help='input file to sample')
+    cmd.add_argument('-n', '--rows', type=int, default=None, help='number of rows to plan for')
+    cmd.add_argument('--sample-rows', type=int, default=1000, help='number of rows to sample')
+    cmd.add_argument('--memory-budget', type=parse_bytes, default=None, help='memory budget (e.g. 8G)')
+    cmd.set_defaults(func=plan)
+
+    args = parser.parse_args(argv)
+    if args.command == 'transform' and not 0 <= args.shard_index < args.shard_count:
+        parser.error('--shard-index must be in [0, --shard-count)')
+    if args.command == 'transform' and args.workers < 1:
+        parser.error('--workers must be at least 1')
+
+    return args
+
+
+def main(argv: List[str] = None) -> int:
+    logging.basicConfig(level=logging.WARNING)
+    args = parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,136 @@
+import os
+import asyncio
+import logging
+import weakref
+import contextvars
+from concurrent.futures import Executor
+from typing import Callable, Any
+
+
+logger = logging.getLogger('concurrency')
+
+# Completion futures of the executor steps started by the current request
+_request_steps = contextvars.ContextVar('request_steps', default=None)
+
+
+class Overloaded(Exception):
+    pass
+
+
+class AsyncRunner(object):
+    """
+    Runs blocking pipeline steps from asyncio code. At most `max_concurrency`
+    requests are processed at a time and at most `max_pending` requests may
+    wait for a slot, beyond that `Overloaded` is raised so that callers get
+    backpressure instead of an ever growing backlog.
+
+    Steps are offloaded to `executor` (the loop's default executor if None),
+    cheap steps (`inline`) of requests with at most `inline_rows` rows run
+    directly on the event loop to avoid the thread hop. Note that a step that has been handed to the
+    executor can't be interrupted, on cancellation or timeout its result is
+    discarded and no further steps are run, but the request keeps its slot
+    until the step has finished.
+
+    A runner is bound to the event loop it is first used on, and can only be
+    moved to another loop once it is idle.
+    """
+    def __init__(
+            self,
+            executor: Executor = None,
+            max_concurrency: int = None,
+            max_pending: int = None,
+            inline_rows: int = 0
+    ):
+        self._executor = executor
+        self._max_concurrency = max_concurrency or os.cpu_count()
+        self._max_pending = max_pending
+        self._inline_rows = inline_rows
+
+        self._loop = None
+        self._slots = None
+        self._waiting = 0
+        self._running = 0
+
+    @property
+    def waiting(self) -> int:
+        return self._waiting
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    def _bind(self, loop: asyncio.AbstractEventLoop) -> None:
+        # The semaphore is created per loop, as it can't be shared between loops
+        if self._loop is loop:
+            return
+        if self._waiting or self._running:
+            raise RuntimeError('AsyncRunner is in use by another event loop')
+
+        self._loop = loop
+        self._slots = asyncio.Semaphore(self._max_concurrency)
+
+    async def __aenter__(self) -> 'AsyncRunner':
+        self._bind(asyncio.get_running_loop())
+
+        if self._max_pending is not None and self._slots.locked() and self._waiting >= self._max_pending:
+            raise Overloaded(f'{self._waiting} requests are already waiting')
+
+        self._waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+
+        self._running += 1
+        _request_steps.set([])
+        return self
+
+    def _release(self, *args) -> None:
+        self._running -= 1
+        self._slots.release()
+
+    async def __aexit__(self, *args) -> None:
+        # A step still running in the executor (after a timeout or cancellation)
+        # holds on to the slot until it's done
+        steps = [step for step in _request_steps.get() or [] if not step.done()]
+        _request_steps.set(None)
+
+        if steps:
+            asyncio.gather(*steps).add_done_callback(self._release)
+        else:
+            self._release()
+
+    async def run(self, func: Callable, *args, inline: bool = False, rows: int = None) -> Any:
+        # Even a cheap step would block the loop for long on a large request
+        if inline and (rows is None or rows <= self._inline_rows):
+            return func(*args)
+
+        loop = asyncio.get_running_loop()
+        done = loop.create_future()
+
+        def _run():
+            try:
+                return func(*args)
+            finally:
+                try:
+                    loop.call_soon_threadsafe(done.set_result, None)
+                except RuntimeError:
+                    # The loop has been closed in the meantime
+                    pass
+
+        steps = _request_steps.get()
+        if steps is not None:
+            steps.append(done)
+
+        return await loop.run_in_executor(self._executor, _run)
+
+
+_default_runners = weakref.WeakKeyDictionary()
+
+
+def default_runner() -> AsyncRunner:
+    # One per event loop, e.g. for each asyncio.run()
+    loop = asyncio.get_running_loop()
+    if loop not in _default_runners:
+        _default_runners[loop] = AsyncRunner()
+    return _default_runners[loop]
@@ -1,10 +1,17 @@
 import os
+import queue
+import asyncio
+import threading
 from typing import List, Dict, Any
 
 import numpy as np
 import pandas as pd
 
+from .cache import PredictionCache
+from .utils import Timer, take_rows
+from .tuning import ChunkSizeTuner
 from .pipeline import Pipeline
+from .concurrency import AsyncRunner, default_runner
 from .serializeable import Serializable
 
 
@@ -118,15 +125,33 @@ class Model(Serializable):
             self,
             path,
             pipeline:Pipeline,
-            output_mapper:ModelOutputMapper
+            output_mapper:ModelOutputMapper,
+            lazy:bool=False,
+            cache:PredictionCache=None
     ):
-        import keras.backend as K
-        from keras.models import load_model
-
         self._path = path
-        self._model = load_model(path)
         self._pipeline = pipeline
         self._mapper = output_mapper
+
+        self._cache = cache
+        self._config_hash = None
+        self._config_state = None
+
+        self._model = None
+        if not lazy:
+            self.load_model()
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._model is not None
+
+    def load_model(self) -> None:
+        # Loads the Keras model into the session of the current process, lazy
+        # models are loaded after forking so that each process owns a session
+        import keras.backend as K
+        from keras.models import load_model
+
+        self._model = load_model(self._path)
         self._tf_graph = K.get_session().graph
 
         self._labeler = self._map_multi if isinstance(self._model.output_shape, list) else self._map_single
@@ -139,10 +164,203 @@ class Model(Serializable):
         Y = dict(zip(self._model.output_names, Y))
         return self._mapper.predictions_to_classes(Y)
 
+    def _forward(self, X, batch_size=1000):
+        with self._tf_graph.as_default():
+            return self._model.predict(X, batch_size=batch_size)
+
+    @property
+    def cache(self) -> PredictionCache:
+        return self._cache
+
+    @property
+    def config_hash(self) -> str:
+        # Recomputed once the pipeline has been refitted or the pipeline or
+        # output mapper replaced, which invalidates the prediction cache
+        state = (id(self._pipeline), self._pipeline.version, id(self._mapper), self._path)
+        if state != self._config_state:
+            self._config_hash = PredictionCache.hash_config(self.to_dict())
+            self._config_state = state
+
+        return self._config_hash
+
+    def _predict_cached(self, df):
+        self._cache.bind(self.config_hash)
+        fields = self._cache.key_fields or sorted(self._pipeline.input_fields)
+
+        obj = self._pipeline.transform_until(df, fields)
+        keys = PredictionCache.hash_records(obj, fields)
+        results = [self._cache.get(key) for key in keys]
+
+        # Only the first occurrence of each missing key is predicted
+        misses = {}
+        for i, (key, result) in enumerate(zip(keys, results)):
+            if result is None and key not in misses:
+                misses[key] = i
+
+        if misses:
+            positions = list(misses.values())
+            X = self._pipeline.transform_from({n: take_rows(v, positions) for n, v in obj.items()}, fields)
+            Y = self._labeler(self._forward(X))
+
+            predicted = {}
+            for j, key in enumerate(misses):
+                predicted[key] = {name: values[j] for name, values in Y.items()}
+                self._cache.put(key, predicted[key])
+
+            results = [predicted[key] if result is None else result for key, result in zip(keys, results)]
+
+        return {
+            name: [result[name] for result in results]
+            for name in results[0]
+        }
+
     def predict(self, obj):
+        if not self.is_loaded:
+            self.load_model()
+
+        if self._cache is not None and len(obj) > 0:
+            with self._tf_graph.as_default():
+                return self._predict_cached(obj)
+
         with self._tf_graph.as_default():
             X = self._pipeline.transform(obj)
-            return self._labeler(self._model.predict(X, batch_size=1000))
+            return self._labeler(self._forward(X))
+
+    def predict_overlapped(
+            self,
+            df:pd.DataFrame,
+            chunk_size:int=None,
+            latency_target:float=None,
+            tuner:ChunkSizeTuner=None,
+            memory_budget:int=None,
+            batch_size:int=1000
+    ):
+        """
+        Predicts in chunks with the stages overlapped, the pipeline transforms
+        chunk k+1 while the model predicts chunk k and the output mapper
+        labels chunk k-1. Chunk sizes are picked by `tuner`, by default the
+        size is tuned for throughput under `latency_target` unless a fixed
+        `chunk_size` is given. Chunks are fed to the model in batches of
+        `batch_size` rows, independent of the chunk size. With a
+        `memory_budget` (bytes) chunks are capped at the size that the
+        pipeline's plan estimates to fit in it.
+        """
+        if not self.is_loaded:
+            self.load_model()
+
+        if len(df) == 0:
+            return self.predict(df)
+
+        if tuner is None:
+            max_size = 100000
+            if memory_budget is not None:
+                # Up to four chunks are alive at a time, one per stage and queue
+                plan = self._pipeline.plan(df.iloc[:1000], len(df), memory_budget // 4)
+                max_size = plan.chunk_size
+
+            if chunk_size is not None and latency_target is None:
+                tuner = ChunkSizeTuner.fixed(min(chunk_size, max_size))
+            else:
+                tuner = ChunkSizeTuner(
+                    initial=min(chunk_size or 1000, max_size),
+                    min_size=min(100, max_size),
+                    max_size=max_size,
+                    latency_target=latency_target
+                )
+
+        transformed = queue.Queue(maxsize=1)
+        predicted = queue.Queue(maxsize=1)
+        stop = threading.Event()
+
+        def put(q, item):
+            while not stop.is_set():
+                try:
+                    return q.put(item, timeout=0.1)
+                except queue.Full:
+                    pass
+
+        def stage(func, source, target):
+            # Passes (rows, data, timings) items from source to target, None
+            # marks the end and an exception is passed on to the consumer
+            try:
+                for item in source():
+                    if stop.is_set():
+                        return
+                    rows, data, timings = item
+                    with Timer() as t:
+                        data = func(data)
+                    put(target, (rows, data, timings + [t.elapsed_secs]))
+                put(target, None)
+            except Exception as e:
+                put(target, e)
+
+        def chunks():
+            start = 0
+            while start < len(df):
+                size = tuner.chunk_size
+                yield min(size, len(df) - start), df.iloc[start:start + size], []
+                start += size
+
+        def drain(q):
+            while not stop.is_set():
+                try:
+                    item = q.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if isinstance(item, Exception):
+                    raise item
+                if item is None:
+                    return
+                yield item
+
+        threads = [
+            threading.Thread(
+                target=stage,
+                args=(self._pipeline.transform, chunks, transformed),
+                name='predict-transform'
+            ),
+            threading.Thread(
+                target=stage,
+                args=(lambda X: self._forward(X, batch_size=batch_size), lambda: drain(transformed), predicted),
+                name='predict-forward'
+            )
+        ]
+        for thread in threads:
+            thread.start()
+
+        results = {}
+        try:
+            for rows, Y, timings in drain(predicted):
+                with Timer() as t:
+                    labels = self._labeler(Y)
+                timings.append(t.elapsed_secs)
+                tuner.observe(rows, max(timings), sum(timings))
+
+                for name, values in labels.items():
+                    results.setdefault(name, []).extend(values)
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+        return results
+
+    async def predict_async(self, obj, runner:AsyncRunner=None, timeout:float=None):
+        runner = runner or default_runner()
+
+        async def _predict():
+            async with runner:
+                if not self.is_loaded:
+                    await runner.run(self.load_model)
+
+                if self._cache is not None and len(obj) > 0:
+                    return await runner.run(self._predict_cached, obj)
+
+                X = await self._pipeline._transform_async(obj, runner)
+                Y = await runner.run(self._forward, X, rows=len(obj))
+                return await runner.run(self._labeler, Y, rows=len(obj))
+
+        return await asyncio.wait_for(_predict(), timeout)
 
     @property
     def params(self):
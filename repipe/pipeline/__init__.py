@@ -2,6 +2,6 @@ from .base import TransformStep, Pipeline, FeatureSelector
 from .embeddings import WordVectorEmbedder
 from .encoders import OneHotEncoderAdapter, OneHotEncodingToBinaryEncoding
 from .keras import KerasTokenizerAdapter, KerasTextHasher, KerasPadSequencesAdapter
-from .misc import DateTimePartExtractor
+from .misc import DateTimePartExtractor, DateTimePartsExtractor
 from .text import TextScrubber, TextFieldUnion
 from .vectorizers import HashingVectorizerAdapter
\ No newline at end of file
@@ -0,0 +1,88 @@
+import logging
+from typing import List, Any
+
+import numpy as np
+from scipy.sparse import csr_matrix, issparse
+
+
+logger = logging.getLogger('pipeline')
+
+
+def _as_2d(part: Any) -> Any:
+    if issparse(part):
+        part = part.tocsr()
+        if not part.has_canonical_format:
+            # Duplicate entries are summed, on a copy as the input isn't ours
+            part = part.copy()
+            part.sum_duplicates()
+        return part
+
+    part = np.asarray(part)
+    if part.ndim > 2:
+        raise ValueError(f'Only 1-D and 2-D features can be assembled, got shape {part.shape}')
+    return part.reshape(-1, 1) if part.ndim == 1 else part
+
+
+def _rows(parts: List[Any]) -> int:
+    rows = {part.shape[0] for part in parts}
+    if len(rows) > 1:
+        raise ValueError(f'Features with different numbers of rows can\'t be assembled: {sorted(rows)}')
+    return rows.pop()
+
+
+def assemble_dense(parts: List[Any], dtype=None) -> np.array:
+    """
+    Writes the parts side by side into one preallocated matrix, casting to
+    `dtype` while copying. Sparse parts are scattered into their slice from
+    their index arrays, without being densified first.
+    """
+    parts = [_as_2d(part) for part in parts]
+    rows = _rows(parts)
+    dtype = dtype or np.result_type(*[part.dtype for part in parts])
+
+    out = np.empty([rows, sum(part.shape[1] for part in parts)], dtype=dtype)
+    col = 0
+    for part in parts:
+        block = out[:, col:col + part.shape[1]]
+        if issparse(part):
+            block[...] = 0
+            block[np.repeat(np.arange(rows), np.diff(part.indptr)), part.indices] = part.data
+        else:
+            block[...] = part
+        col += part.shape[1]
+
+    return out
+
+
+def assemble_sparse(parts: List[Any], dtype=None) -> csr_matrix:
+    """
+    Combines the parts side by side into one CSR matrix, the data and index
+    arrays are allocated once and each part's entries are written straight
+    to their final positions.
+    """
+    parts = [part if issparse(part) else csr_matrix(part) for part in map(_as_2d, parts)]
+    rows = _rows(parts)
+    dtype = dtype or np.result_type(*[part.dtype for part in parts])
+
+    row_nnz = sum(np.diff(part.indptr) for part in parts)
+    cols = sum(part.shape[1] for part in parts)
+    nnz = int(row_nnz.sum())
+    index_dtype = np.int32 if max(cols, nnz) < 2**31 else np.int64
+
+    indptr = np.zeros(rows + 1, dtype=index_dtype)
+    np.cumsum(row_nnz, out=indptr[1:])
+    data = np.empty(nnz, dtype=dtype)
+    indices = np.empty(nnz, dtype=index_dtype)
+
+    # Next free position of each row, parts are laid out left to right
+    free = indptr[:-1].copy()
+    col = 0
+    for part in parts:
+        counts = np.diff(part.indptr)
+        dest = np.repeat(free - part.indptr[:-1], counts) + np.arange(part.nnz)
+        data[dest] = part.data
+        indices[dest] = part.indices + col
+        free += counts
+        col += part.shape[1]
+
+    return csr_matrix((data, indices, indptr), shape=(rows, cols))
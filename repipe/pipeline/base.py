@@ -1,18 +1,29 @@
+import os
+import asyncio
 import logging
+import multiprocessing
+from itertools import chain
 from abc import ABCMeta, abstractmethod
-from typing import List, Dict, Any, Union
+from typing import List, Dict, Any, Union, Optional, Set
 
 
 import pandas as pd
 
 from ..utils import Timer
 from ..serializeable import Serializable
+from ..concurrency import AsyncRunner, default_runner
+from .assembly import assemble_dense, assemble_sparse
+from .planner import PipelinePlan, StepEstimate, estimate_field
 
 
 logger = logging.getLogger('pipeline')
 
 
 class FitTransformMixin(Serializable, metaclass=ABCMeta):
+    # Cheap transforms are run directly on the event loop by AsyncRunner.run
+    # for requests of at most its inline_rows rows
+    inline = False
+
     def fit(self, *args):
         pass
 
@@ -21,6 +32,20 @@ class FitTransformMixin(Serializable, metaclass=ABCMeta):
         pass
 
 
+class RecordTransformMixin(FitTransformMixin):
+    """
+    A transform that can also be applied to a single record, which allows the
+    pipeline to fuse chains of such steps into one pass over the data.
+    """
+    @abstractmethod
+    def transform_record(self, *values):
+        pass
+
+    def collect(self, records: List[Any], index=None) -> Any:
+        # Builds the same container as transform() from the per-record results
+        return pd.Series(records, index=index)
+
+
 class TransformStep(FitTransformMixin):
     def __init__(
             self,
@@ -37,6 +62,22 @@ class TransformStep(FitTransformMixin):
         self._in_fields = in_fields
         self._transformer = transform
 
+    @property
+    def out_field(self) -> str:
+        return self._out_field
+
+    @property
+    def in_fields(self) -> List[str]:
+        return self._in_fields
+
+    @property
+    def transformer(self) -> FitTransformMixin:
+        return self._transformer
+
+    @property
+    def inline(self) -> bool:
+        return self._transformer.inline
+
     def fit(self, obj: Dict[str, Union[pd.Series, Any]]) -> None:
         with Timer() as t:
             fields = [obj[name] for name in self._in_fields]
@@ -60,27 +101,237 @@ class TransformStep(FitTransformMixin):
 
 
 class FeatureSelector(FitTransformMixin):
-    def __init__(self, features: List[str]):
+    """
+    Selects the features that are fed to the model. With a `layout`, groups
+    of 2-D features are assembled into a single matrix each, e.g.
+
+        layout=[{'features': ['company_onehot', 'word_hashes'], 'sparse': True, 'dtype': 'float32'}]
+
+    Each group takes the place of its first feature in the output, dense
+    groups are written into one preallocated array and sparse groups are
+    combined into one CSR matrix.
+    """
+    def __init__(self, features: List[str], layout: List[Dict[str, Any]] = None):
         super().__init__()
         self._features = features
+        self._layout = layout or []
+
+        grouped = set()
+        for group in self._layout:
+            unknown = set(group['features']) - set(features)
+            if unknown:
+                raise ValueError(f'Layout features {sorted(unknown)} are not selected')
+
+            repeated = grouped & set(group['features'])
+            if repeated:
+                raise ValueError(f'Layout features {sorted(repeated)} are in more than one group')
+            grouped.update(group['features'])
+
+    @property
+    def in_fields(self) -> List[str]:
+        return self._features
+
+    @property
+    def inline(self) -> bool:
+        # Assembling copies all features and isn't cheap enough to run inline
+        return not self._layout
+
+    @property
+    def outputs(self) -> List[str]:
+        # Names of the returned values, a group is named after its features
+        groups = {group['features'][0]: group for group in self._layout}
+        grouped = {name for group in self._layout for name in group['features']}
 
-    def transform(self, obj: Dict[str, Any]) -> List[Any]:
         return [
-            obj[name]
+            '+'.join(groups[name]['features']) if name in groups else name
             for name in self._features
+            if name in groups or name not in grouped
         ]
 
+    def _assemble(self, obj: Dict[str, Any], group: Dict[str, Any]) -> Any:
+        parts = [obj[name] for name in group['features']]
+        assemble = assemble_sparse if group.get('sparse', False) else assemble_dense
+        return assemble(parts, dtype=group.get('dtype'))
+
+    def transform(self, obj: Dict[str, Any]) -> List[Any]:
+        if not self._layout:
+            return [
+                obj[name]
+                for name in self._features
+            ]
+
+        with Timer() as t:
+            groups = {group['features'][0]: group for group in self._layout}
+            grouped = {name for group in self._layout for name in group['features']}
+
+            result = []
+            for name in self._features:
+                if name in groups:
+                    result.append(self._assemble(obj, groups[name]))
+                elif name not in grouped:
+                    result.append(obj[name])
+        logger.info(f'Finished assembling {len(self._layout)} feature groups  in {int(t.elapsed)} ms')
+        return result
+
     @property
     def params(self):
-        return {
+        params = {
             'features': self._features
         }
+        if self._layout:
+            params['layout'] = self._layout
+        return params
+
+
+# The fused step and its input columns in a pool worker, set by the pool's
+# initializer so that only row ranges and results are pickled
+_fused_state = None
+
+
+def _init_fused_worker(step: 'FusedTransformStep', columns: List[Any]) -> None:
+    global _fused_state
+    _fused_state = (step, columns)
+
+
+def _transform_fused_range(bounds) -> List[Any]:
+    step, columns = _fused_state
+    return step._transform_rows(columns, *bounds)
+
+
+class FusedTransformStep(FitTransformMixin):
+    """
+    Runs a chain of record-wise steps as a single pass per record, only the
+    output of the last step is written to the object. An optional trailing
+    step consumes the collected records without them being written either.
+    With `n_jobs` above 1 (-1 for one per CPU), inputs of more than
+    `chunk_size` rows are split into chunks that are run by forked
+    processes, except in daemonic processes, which can't have children.
+    """
+    chunk_size = 1000
+    n_jobs = 1
+
+    def __init__(self, steps: List[TransformStep], sink: TransformStep = None):
+        super().__init__()
+        self._steps = steps
+        self._sink = sink
+
+    @property
+    def out_field(self) -> str:
+        return (self._sink or self._steps[-1]).out_field
+
+    def _transform_rows(self, columns: List[Any], start: int, stop: int) -> List[Any]:
+        head, *tail = [step.transformer.transform_record for step in self._steps]
+
+        records = []
+        for values in zip(*[column[start:stop] for column in columns]):
+            value = head(*values)
+            for f in tail:
+                value = f(value)
+            records.append(value)
+        return records
+
+    def _transform_parallel(self, columns: List[Any], rows: int) -> List[Any]:
+        n_jobs = self.n_jobs if self.n_jobs > 0 else os.cpu_count()
+        bounds = [(i, min(i + self.chunk_size, rows)) for i in range(0, rows, self.chunk_size)]
+        if (
+                n_jobs < 2 or len(bounds) < 2 or
+                multiprocessing.current_process().daemon or
+                'fork' not in multiprocessing.get_all_start_methods()
+        ):
+            return self._transform_rows(columns, 0, rows)
+
+        # The state is handed to the workers rather than kept in this process,
+        # so concurrent transforms from other threads don't see each other's
+        ctx = multiprocessing.get_context('fork')
+        with ctx.Pool(min(n_jobs, len(bounds)), initializer=_init_fused_worker, initargs=(self, columns)) as pool:
+            return list(chain.from_iterable(pool.imap(_transform_fused_range, bounds)))
+
+    def transform(self, obj: Dict[str, Union[pd.Series, Any]]) -> Dict[str, Union[pd.Series, Any]]:
+        with Timer() as t:
+            fields = [obj[name] for name in self._steps[0].in_fields]
+
+            # Series are sliced through their values, which doesn't copy them
+            columns = [field.values if isinstance(field, pd.Series) else field for field in fields]
+            records = self._transform_parallel(columns, len(columns[0]))
+
+            index = getattr(fields[0], 'index', None)
+            result = self._steps[-1].transformer.collect(records, index=index)
+            if self._sink is not None:
+                result = self._sink.transformer.transform(result)
+
+            obj[self.out_field] = result
+        logger.info(f'Finished fused step {self.out_field} ({len(self)} steps)  in {int(t.elapsed)} ms')
+        return obj
+
+    def __len__(self):
+        return len(self._steps) + (self._sink is not None)
+
+    @property
+    def params(self):
+        return {
+            'steps': [step.to_dict() for step in self._steps],
+            'sink': self._sink.to_dict() if self._sink is not None else None
+        }
 
 
 class Pipeline(FitTransformMixin):
-    def __init__(self, steps: List[FitTransformMixin]):
+    def __init__(self, steps: List[FitTransformMixin], fuse: bool = False):
         super().__init__()
         self._steps = steps
+        self._fuse = fuse
+        self._version = 0
+
+    @staticmethod
+    def _reads(steps: List[FitTransformMixin]) -> Optional[Set[str]]:
+        # Fields read by the steps, None if a step may read any field
+        fields = set()
+        for step in steps:
+            if not isinstance(step, (TransformStep, FeatureSelector)):
+                return None
+            fields.update(step.in_fields)
+        return fields
+
+    @staticmethod
+    def _is_record_step(step: FitTransformMixin) -> bool:
+        return isinstance(step, TransformStep) and isinstance(step.transformer, RecordTransformMixin)
+
+    def _plan(self, steps: List[FitTransformMixin], keep: Optional[Set[str]] = None) -> List[FitTransformMixin]:
+        """
+        Groups chains of record-wise steps into fused steps. A step is only
+        appended to a chain if it solely reads the output of the previous
+        step, and that output is neither read by a later step nor part of
+        `keep` (None keeps all fields).
+        """
+        if not self._fuse or keep is None:
+            return list(steps)
+
+        plan = []
+        i = 0
+        while i < len(steps):
+            chain, sink = [steps[i]], None
+            while self._is_record_step(chain[-1]) and i + len(chain) < len(steps):
+                j = i + len(chain)
+                step, field = steps[j], chain[-1].out_field
+                reads = self._reads(steps[j + 1:])
+
+                if not isinstance(step, TransformStep) or step.in_fields != [field]:
+                    break
+                if reads is None or field in reads or field in keep:
+                    break
+
+                if self._is_record_step(step):
+                    chain.append(step)
+                else:
+                    sink = step
+                    break
+
+            if len(chain) > 1 or sink is not None:
+                plan.append(FusedTransformStep(chain, sink))
+            else:
+                plan.append(chain[0])
+            i += len(chain) + (sink is not None)
+
+        return plan
 
     def fit(self, df: pd.DataFrame) -> None:
         obj = {name: series for name, series in df.iteritems()}
@@ -88,17 +339,124 @@ class Pipeline(FitTransformMixin):
             step.fit(obj)
             obj = step.transform(obj)
 
+        self._version += 1
+        return obj
+
+    @property
+    def version(self) -> int:
+        # Incremented whenever the pipeline is fitted
+        return self._version
+
+    def _transform_plan(self, steps: List[FitTransformMixin] = None) -> List[FitTransformMixin]:
+        # Intermediate fields only need to be kept if the result is the object itself
+        keep = set() if isinstance(self._steps[-1], FeatureSelector) else None
+        return self._plan(self._steps if steps is None else steps, keep)
+
+    @property
+    def input_fields(self) -> Set[str]:
+        # Fields that are read from the input rather than produced by a step
+        fields, produced = set(), set()
+        for step in self._steps:
+            if isinstance(step, (TransformStep, FeatureSelector)):
+                fields.update(name for name in step.in_fields if name not in produced)
+            if isinstance(step, TransformStep):
+                produced.add(step.out_field)
+
+        return fields
+
+    def _split(self, fields: List[str]) -> int:
+        # Number of leading steps needed for all fields to be available
+        missing = set(fields) - self.input_fields
+        for i, step in enumerate(self._steps):
+            if not missing:
+                return i
+            if isinstance(step, TransformStep):
+                missing.discard(step.out_field)
+
+        if missing:
+            raise KeyError(f'Fields {sorted(missing)} are not produced by the pipeline')
+        return len(self._steps)
+
+    def transform_until(self, df: pd.DataFrame, fields: List[str]) -> Dict[str, Any]:
+        """
+        Runs the leading steps needed to produce `fields` and returns the
+        object, the remaining steps are run by `transform_from`.
+        """
+        obj = {name: series for name, series in df.iteritems()}
+        for step in self._steps[:self._split(fields)]:
+            obj = step.transform(obj)
+
+        return obj
+
+    def transform_from(self, obj: Dict[str, Any], fields: List[str]) -> Any:
+        for step in self._transform_plan(self._steps[self._split(fields):]):
+            obj = step.transform(obj)
+
         return obj
 
     def transform(self, df: pd.DataFrame) -> Any:
         obj = {name: series for name, series in df.iteritems()}
-        for step in self._steps:
+        for step in self._transform_plan():
             obj = step.transform(obj)
 
         return obj
 
+    def plan(self, sample_df: pd.DataFrame, n_rows: int = None, memory_budget: int = None) -> PipelinePlan:
+        """
+        Runs the pipeline step by step on a sample and extrapolates the
+        memory use of each field and the time of each step to `n_rows` rows,
+        the plan recommends a chunk size that fits in `memory_budget` bytes.
+        """
+        rows = len(sample_df)
+        obj = {name: series for name, series in sample_df.iteritems()}
+        fields = {name: estimate_field(name, value, rows) for name, value in obj.items()}
+        steps = []
+
+        for step in self._steps:
+            with Timer() as t:
+                result = step.transform(obj)
+
+            name = step.out_field if isinstance(step, TransformStep) else type(step).__name__
+            steps.append(StepEstimate(name, t.elapsed_secs / max(rows, 1)))
+
+            # A FeatureSelector returns the selected fields, which aren't copies,
+            # apart from the matrices that it assembles from groups of them
+            if isinstance(step, FeatureSelector):
+                for name, value in zip(step.outputs, result):
+                    if name not in fields:
+                        fields[name] = estimate_field(name, value, rows)
+
+            elif isinstance(result, dict):
+                obj = result
+                for name, value in obj.items():
+                    if name not in fields or name == getattr(step, 'out_field', None):
+                        fields[name] = estimate_field(name, value, rows)
+
+        plan = PipelinePlan(rows, n_rows or rows, list(fields.values()), steps, memory_budget)
+        logger.info(f'Planned {plan.n_rows} rows: {plan.peak_bytes / 2**20:.1f} MB, {plan.secs:.1f}s')
+        return plan
+
+    async def _transform_async(self, df: pd.DataFrame, runner: AsyncRunner) -> Any:
+        obj = {name: series for name, series in df.iteritems()}
+        for step in self._transform_plan():
+            obj = await runner.run(step.transform, obj, inline=step.inline, rows=len(df))
+
+        return obj
+
+    async def transform_async(self, df: pd.DataFrame, runner: AsyncRunner = None, timeout: float = None) -> Any:
+        runner = runner or default_runner()
+
+        async def _transform():
+            async with runner:
+                return await self._transform_async(df, runner)
+
+        return await asyncio.wait_for(_transform(), timeout)
+
     @property
     def params(self):
-        return {
+        params = {
             'steps': [step.to_dict() for step in self._steps]
         }
+        if self._fuse:
+            params['fuse'] = self._fuse
+        return params
@@ -8,13 +8,13 @@ from keras_preprocessing.text import Tokenizer
 from keras_preprocessing.text import hashing_trick
 from keras_preprocessing.sequence import pad_sequences
 
-from .base import FitTransformMixin
+from .base import FitTransformMixin, RecordTransformMixin
 
 
 logger = logging.getLogger('pipeline')
 
 
-class KerasTokenizerAdapter(FitTransformMixin):
+class KerasTokenizerAdapter(RecordTransformMixin):
     def __init__(self, **kwargs):
         kwargs['oov_token'] = '<mis>'
 
@@ -50,6 +50,14 @@ class KerasTokenizerAdapter(FitTransformMixin):
         self._encoder.word_index = word_index
         self._encoder.index_word = {idx: k for k, idx in word_index.items()}
 
+    def transform_record(self, text: str) -> List[int]:
+        tokens = self._encoder.texts_to_sequences([text])[0]
+        tokens.append(self._encoder.word_index['<eos>'])
+        return tokens
+
+    def collect(self, records, index=None) -> List[List[int]]:
+        return records
+
     def transform(self, X: pd.Series) -> List[List[int]]:
         def _transform(X: pd.Series) -> List[List[int]]:
             eos = self._encoder.word_index['<eos>']
@@ -84,10 +92,16 @@ class KerasTokenizerAdapter(FitTransformMixin):
         }
 
 
-class KerasTextHasher(FitTransformMixin):
+class KerasTextHasher(RecordTransformMixin):
     def __init__(self, hash_slots: int):
         self._hash_slots = hash_slots
 
+    def transform_record(self, text: str) -> List[int]:
+        return hashing_trick(text.lower(), n=self._hash_slots)
+
+    def collect(self, records, index=None) -> List[List[int]]:
+        return records
+
     def transform(self, series: pd.Series) ->  List[List[int]]:
         def _transform(X: pd.Series) -> List[List[int]]:
             return [
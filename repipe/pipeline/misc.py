@@ -1,4 +1,7 @@
 import logging
+from typing import List, Union
+
+import numpy as np
 import pandas as pd
 from .base import FitTransformMixin
 
@@ -16,4 +19,123 @@ class DateTimePartExtractor(FitTransformMixin):
     def params(self):
         return {
             'part': self._part
-        }
\ No newline at end of file
+        }
+
+
+class DateTimePartsExtractor(FitTransformMixin):
+    """
+    Extracts several parts of a date column into one matrix with a column
+    per part, parsing each distinct value once. Missing or unparseable values
+    are encoded as -1. With `cyclical` each part is encoded as a sin/cos
+    pair of columns instead and missing values as zeros. `dtype` defaults to
+    int32, or float32 for the cyclical encoding.
+    """
+    # Largest value of each part, the type must also hold -1 for missing values
+    MAX_VALUES = {
+        'year': 2262,
+        'month': 12,
+        'day': 31,
+        'dayofyear': 366,
+        'quarter': 4,
+        'dayofweek': 6,
+        'weekday': 6,
+        'daysinmonth': 31,
+        'hour': 23,
+        'minute': 59,
+        'second': 59,
+        'microsecond': 999999,
+        'nanosecond': 999,
+    }
+
+    # Period and first value of each part, used for the cyclical encoding
+    CYCLES = {
+        'month': (12, 1),
+        'day': (31, 1),
+        'dayofyear': (366, 1),
+        'quarter': (4, 1),
+        'dayofweek': (7, 0),
+        'weekday': (7, 0),
+        'hour': (24, 0),
+        'minute': (60, 0),
+        'second': (60, 0),
+    }
+
+    def __init__(
+            self,
+            parts: Union[str, List[str]],
+            format: str = None,
+            cyclical: bool = False,
+            dtype: str = None
+    ):
+        if type(parts) is not list:
+            parts = [parts]
+
+        unknown = [part for part in parts if part not in self.MAX_VALUES]
+        if unknown:
+            raise ValueError(f'Unknown date parts {unknown}')
+
+        if cyclical:
+            unsupported = [part for part in parts if part not in self.CYCLES]
+            if unsupported:
+                raise ValueError(f'Parts {unsupported} have no cyclical encoding')
+            if dtype is not None and np.dtype(dtype).kind != 'f':
+                raise ValueError(f'The cyclical encoding needs a float dtype, got {dtype}')
+        elif dtype is not None:
+            if np.dtype(dtype).kind != 'i':
+                raise ValueError(f'Date parts need a signed integer dtype, got {dtype}')
+
+            too_large = [part for part in parts if self.MAX_VALUES[part] > np.iinfo(dtype).max]
+            if too_large:
+                raise ValueError(f'Parts {too_large} don\'t fit in {dtype}')
+
+        self._parts = parts
+        self._format = format
+        self._cyclical = cyclical
+        self._dtype = dtype
+
+    def _part_table(self, values: np.array) -> np.array:
+        # Each distinct value is only parsed once, missing or unparseable
+        # values are marked with -1
+        parsed = pd.Series(pd.to_datetime(values, format=self._format, errors='coerce'))
+        dtype = 'int32' if self._cyclical else (self._dtype or 'int32')
+
+        table = np.empty([len(parsed) + 1, len(self._parts)], dtype=dtype)
+        for j, part in enumerate(self._parts):
+            table[:-1, j] = getattr(parsed.dt, part).fillna(-1).values
+
+        # Last row is used for values that are missing in the input
+        table[-1] = -1
+        return table
+
+    def _cyclical_table(self, table: np.array) -> np.array:
+        periods, offsets = np.array([self.CYCLES[part] for part in self._parts], dtype='float32').T
+        angles = 2 * np.pi * (table - offsets) / periods
+
+        encoded = np.empty([table.shape[0], 2 * table.shape[1]], dtype=self._dtype or 'float32')
+        encoded[:, 0::2] = np.sin(angles)
+        encoded[:, 1::2] = np.cos(angles)
+        encoded[np.repeat(table < 0, 2, axis=1)] = 0
+        return encoded
+
+    def transform(self, series: pd.Series) -> np.array:
+        logger.debug('DateTimePartsExtractor::transform - Start')
+        try:
+            codes, uniques = pd.factorize(series)
+
+            table = self._part_table(np.asarray(uniques))
+            if self._cyclical:
+                table = self._cyclical_table(table)
+
+            # Missing values have code -1 which selects the last row of the table
+            return table[codes]
+        finally:
+            logger.debug('DateTimePartsExtractor::transform - Done')
+
+    @property
+    def params(self):
+        return {
+            'parts': self._parts,
+            'format': self._format,
+            'cyclical': self._cyclical,
+            'dtype': self._dtype
+        }
@@ -0,0 +1,128 @@
+import sys
+import logging
+from typing import List, Tuple, NamedTuple, Any
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import spmatrix
+
+
+logger = logging.getLogger('pipeline')
+
+
+class FieldEstimate(NamedTuple):
+    name: str
+    type: str
+    dtype: str
+    shape: Tuple[int, ...]
+    sparsity: float
+    bytes_per_row: float
+
+
+class StepEstimate(NamedTuple):
+    name: str
+    secs_per_row: float
+
+
+def _deep_sizeof(value: Any) -> int:
+    size = sys.getsizeof(value)
+    if isinstance(value, (list, tuple)):
+        size += sum(_deep_sizeof(v) for v in value)
+    return size
+
+
+def estimate_field(name: str, value: Any, rows: int) -> FieldEstimate:
+    """
+    Estimates the type, per row shape, sparsity and memory use of a field
+    from its value on a sample of `rows` rows.
+    """
+    rows = max(rows, 1)
+
+    if isinstance(value, spmatrix):
+        nbytes = value.data.nbytes + value.indices.nbytes + value.indptr.nbytes
+        sparsity = 1 - value.nnz / max(np.prod(value.shape), 1)
+        return FieldEstimate(name, type(value).__name__, str(value.dtype), value.shape[1:], sparsity, nbytes / rows)
+
+    elif isinstance(value, np.ndarray):
+        sparsity = 1 - np.count_nonzero(value) / max(value.size, 1) if value.dtype.kind in 'biuf' else 0.0
+        return FieldEstimate(name, 'ndarray', str(value.dtype), value.shape[1:], sparsity, value.nbytes / rows)
+
+    elif isinstance(value, pd.Series):
+        return FieldEstimate(name, 'Series', str(value.dtype), (), 0.0, value.memory_usage(deep=True) / rows)
+
+    elif isinstance(value, list):
+        lengths = [len(v) for v in value if isinstance(v, (list, tuple))]
+        shape = (int(np.ceil(np.mean(lengths))),) if lengths else ()
+        return FieldEstimate(name, 'list', 'object', shape, 0.0, _deep_sizeof(value) / rows)
+
+    return FieldEstimate(name, type(value).__name__, '', (), 0.0, sys.getsizeof(value) / rows)
+
+
+class PipelinePlan(object):
+    """
+    Estimates of a pipeline run on `n_rows` rows, extrapolated linearly from
+    a run on a sample. The memory estimate assumes that all fields are kept
+    until the end, which is the case unless steps are fused.
+    """
+    def __init__(
+            self,
+            sample_rows: int,
+            n_rows: int,
+            fields: List[FieldEstimate],
+            steps: List[StepEstimate],
+            memory_budget: int = None
+    ):
+        self.sample_rows = sample_rows
+        self.n_rows = n_rows
+        self.fields = fields
+        self.steps = steps
+        self.memory_budget = memory_budget
+
+    @property
+    def bytes_per_row(self) -> float:
+        return sum(field.bytes_per_row for field in self.fields)
+
+    @property
+    def peak_bytes(self) -> int:
+        return int(self.bytes_per_row * self.n_rows)
+
+    @property
+    def secs(self) -> float:
+        return sum(step.secs_per_row for step in self.steps) * self.n_rows
+
+    def recommend_chunk_size(self, memory_budget: int = None) -> int:
+        # Largest number of rows whose fields fit in the budget
+        memory_budget = memory_budget or self.memory_budget
+        if memory_budget is None:
+            return self.n_rows
+
+        return int(max(1, min(self.n_rows, memory_budget // max(self.bytes_per_row, 1))))
+
+    @property
+    def chunk_size(self) -> int:
+        return self.recommend_chunk_size()
+
+    def fields_frame(self) -> pd.DataFrame:
+        df = pd.DataFrame(self.fields, columns=FieldEstimate._fields).set_index('name')
+        df['total_mb'] = df.bytes_per_row * self.n_rows / 2**20
+        return df
+
+    def steps_frame(self) -> pd.DataFrame:
+        df = pd.DataFrame(self.steps, columns=StepEstimate._fields).set_index('name')
+        df['total_secs'] = df.secs_per_row * self.n_rows
+        return df
+
+    def __str__(self):
+        lines = [
+            f'Plan for {self.n_rows} rows (sampled {self.sample_rows})',
+            '',
+            self.fields_frame().round(3).to_string(),
+            '',
+            self.steps_frame().to_string(),
+            '',
+            f'Peak memory: {self.peak_bytes / 2**20:.1f} MB, time: {self.secs:.1f}s'
+        ]
+        if self.memory_budget is not None:
+            lines.append(f'Recommended chunk size for {self.memory_budget / 2**20:.1f} MB: {self.chunk_size} rows')
+
+        return '\n'.join(lines)
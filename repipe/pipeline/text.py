@@ -7,14 +7,14 @@ import nltk
 import pandas as pd
 from joblib import Parallel, delayed
 
-from .base import FitTransformMixin
+from .base import RecordTransformMixin
 
 
 nltk.download('punkt', quiet=True)
 logger = logging.getLogger('pipeline')
 
 
-class TextScrubber(FitTransformMixin):
+class TextScrubber(RecordTransformMixin):
     def __init__(
             self,
             lower=False,
@@ -38,6 +38,19 @@ class TextScrubber(FitTransformMixin):
             (re.compile('[0-9][0-9- ]*'), ' __NUM__ ')
         ])
 
+    def transform_record(self, text: str):
+        if self._lower:
+            text = text.lower()
+
+        for regex, subs in self._scrubbers:
+            text = regex.sub(subs, text)
+
+        tokens = [tok for tok in nltk.word_tokenize(text) if len(tok)]
+        return tokens if self._tokenize else ' '.join(tokens)
+
+    def collect(self, records, index=None) -> pd.Series:
+        return pd.Series(records)
+
     def transform(self, series: pd.Series) -> pd.Series:
         def _transform(X: pd.Series):
             if self._lower:
@@ -89,10 +102,15 @@ class TextScrubber(FitTransformMixin):
         }
 
 
-class TextFieldUnion(FitTransformMixin):
+class TextFieldUnion(RecordTransformMixin):
+    inline = True
+
     def __init__(self, separator=' . '):
         self._sep = separator
 
+    def transform_record(self, *values: str) -> str:
+        return self._sep.join('' if pd.isnull(value) else value for value in values)
+
     def transform(self, *series: List[pd.Series]) -> pd.Series:
         logger.debug('TextFieldUnion::transform - Start')
         try:
@@ -0,0 +1,330 @@
+import gc
+import os
+import logging
+import threading
+import itertools
+import traceback
+import multiprocessing
+from collections import deque
+from timeit import default_timer
+from concurrent.futures import Future
+from multiprocessing.connection import wait
+from typing import Dict, Any
+
+from .model import Model
+from .utils import Timer
+from .concurrency import Overloaded
+from .serializeable import Serializable, locate_class
+
+
+logger = logging.getLogger('serving')
+
+
+def _serve(worker_id: int, model: Any, conn) -> None:
+    # Runs in the forked worker, the pipeline artifacts are inherited from the
+    # parent while the Keras model and its session are created here
+    if isinstance(model, Model) and not model.is_loaded:
+        model.load_model()
+
+    conn.send(('ready', os.getpid()))
+    while True:
+        item = conn.recv()
+        if item is None:
+            break
+
+        request_id, obj = item
+        with Timer() as t:
+            try:
+                result, ok = model.predict(obj), True
+            except Exception:
+                result, ok = traceback.format_exc(), False
+
+        conn.send(('done', request_id, ok, result, t.elapsed, len(obj)))
+
+
+class ModelServer(object):
+    """
+    Serves a model from a pool of pre-forked worker processes. The model
+    configuration is loaded once in the parent and shared copy-on-write with
+    the workers, each of which loads its own Keras session. A `Model` must
+    therefore be created with `lazy=True`.
+
+    Requests wait in a local queue (at most `max_pending`, beyond that
+    `Overloaded` is raised) and are handed to idle workers over a pipe per
+    worker. Pipes aren't shared, so a worker that dies can't leave a lock
+    held that the other workers wait for. Worker liveness is checked every
+    `check_interval` seconds, the request of a dead worker is failed and the
+    worker restarted.
+    """
+    check_interval = 0.5
+
+    def __init__(self, model: Any, workers: int = None, max_pending: int = None, restart: bool = True):
+        if isinstance(model, Model) and model.is_loaded:
+            # The workers would share the forked TF session of the parent
+            raise ValueError('The model is already loaded, create it with lazy=True')
+
+        self._model = model
+        self._n_workers = workers or os.cpu_count()
+        self._max_pending = max_pending
+        self._restart = restart
+
+        self._ctx = multiprocessing.get_context('fork')
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._ids = itertools.count()
+        self._pending = {}
+        self._backlog = deque()
+        self._workers = {}
+        self._dispatcher = None
+        self._closing = threading.Event()
+        self._stopping = threading.Event()
+
+        self._started = None
+        self._counters = {'submitted': 0, 'completed': 0, 'failed': 0, 'rows': 0, 'restarts': 0}
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], **kwargs) -> 'ModelServer':
+        instance = config['instance']
+        params = Serializable.load(instance['params'])
+        model = locate_class(instance['cls'])(lazy=True, **params)
+        return cls(model, **kwargs)
+
+    def _spawn(self, worker_id: int) -> None:
+        conn, child_conn = self._ctx.Pipe()
+        process = self._ctx.Process(target=_serve, args=(worker_id, self._model, child_conn), daemon=True)
+        process.start()
+        child_conn.close()
+
+        # Counters are kept when a worker is restarted
+        previous = self._workers.get(worker_id, {})
+        self._workers[worker_id] = {
+            'process': process,
+            'conn': conn,
+            'ready': False,
+            'closed': False,
+            'dead': False,
+            'request': None,
+            'requests': previous.get('requests', 0),
+            'rows': previous.get('rows', 0),
+            'busy_ms': previous.get('busy_ms', 0.0)
+        }
+        logger.info(f'Started worker {worker_id} with pid {process.pid}')
+
+    def start(self) -> 'ModelServer':
+        # Move everything loaded so far out of the collector's reach, this
+        # keeps the collector from touching (and copying) the shared pages
+        gc.collect()
+        if hasattr(gc, 'freeze'):
+            gc.freeze()
+
+        with Timer() as t:
+            for worker_id in range(self._n_workers):
+                self._spawn(worker_id)
+        logger.info(f'Forked {self._n_workers} workers in {int(t.elapsed)} ms')
+
+        self._started = default_timer()
+        self._dispatcher = threading.Thread(target=self._dispatch, name='model-server-dispatch', daemon=True)
+        self._dispatcher.start()
+        return self
+
+    def _assign(self) -> None:
+        # Hands queued requests to idle workers, called with the lock held
+        for worker in self._workers.values():
+            if not self._backlog:
+                return
+            if not worker['ready'] or worker['closed'] or worker['request'] is not None:
+                continue
+
+            request_id, obj = self._backlog.popleft()
+            worker['request'] = request_id
+            try:
+                worker['conn'].send((request_id, obj))
+            except (OSError, ValueError):
+                # The worker died in the meantime, its request is failed by _check_workers
+                worker['closed'] = True
+
+    def _receive(self, worker_id: int, worker: Dict[str, Any]) -> None:
+        # Handles all messages that the worker has sent, called with the lock held
+        try:
+            while not worker['closed'] and worker['conn'].poll():
+                kind, *payload = worker['conn'].recv()
+                if kind == 'ready':
+                    worker['ready'] = True
+                elif kind == 'done':
+                    self._complete(worker_id, worker, *payload)
+        except (EOFError, OSError):
+            # The worker is gone, which is dealt with by _check_workers
+            worker['closed'] = True
+
+    def _complete(self, worker_id: int, worker: Dict[str, Any], request_id, ok, result, elapsed, rows) -> None:
+        worker['request'] = None
+        worker['requests'] += 1
+        worker['rows'] += rows
+        worker['busy_ms'] += elapsed
+
+        future = self._pending.pop(request_id, None)
+        if ok:
+            self._counters['completed'] += 1
+            self._counters['rows'] += rows
+            if future is not None:
+                future.set_result(result)
+        else:
+            self._counters['failed'] += 1
+            if future is not None:
+                future.set_exception(RuntimeError(f'Worker {worker_id} failed:\n{result}'))
+
+    def _dispatch(self) -> None:
+        last_check = default_timer()
+        while True:
+            with self._lock:
+                conns = {
+                    worker['conn']: worker_id
+                    for worker_id, worker in self._workers.items()
+                    if not worker['closed']
+                }
+
+            ready = wait(list(conns), timeout=self.check_interval)
+            with self._lock:
+                for conn in ready:
+                    worker = self._workers[conns[conn]]
+                    if worker['conn'] is conn:
+                        self._receive(conns[conn], worker)
+
+                # Checked on a timer so that dead workers are noticed under load too
+                if default_timer() - last_check >= self.check_interval:
+                    self._check_workers()
+                    last_check = default_timer()
+
+                self._assign()
+                self._idle.notify_all()
+
+                if self._stopping.is_set() and not any(w['process'].is_alive() for w in self._workers.values()):
+                    break
+
+    def _check_workers(self) -> None:
+        # Called with the lock held
+        for worker_id, worker in list(self._workers.items()):
+            if worker['dead'] or worker['process'].is_alive():
+                continue
+
+            # Responses sent before the worker died are still in the pipe
+            self._receive(worker_id, worker)
+            worker['dead'] = worker['closed'] = True
+            worker['conn'].close()
+
+            if self._closing.is_set():
+                continue
+
+            logger.warning(f'Worker {worker_id} died with exit code {worker["process"].exitcode}')
+            future = self._pending.pop(worker['request'], None)
+            if future is not None:
+                self._counters['failed'] += 1
+                future.set_exception(RuntimeError(f'Worker {worker_id} died while processing the request'))
+
+            if self._restart:
+                self._counters['restarts'] += 1
+                self._spawn(worker_id)
+
+    def submit(self, obj: Any) -> Future:
+        if self._dispatcher is None or self._closing.is_set():
+            raise RuntimeError('The server is not running')
+
+        future = Future()
+        with self._lock:
+            if self._max_pending is not None and len(self._backlog) >= self._max_pending:
+                raise Overloaded(f'{len(self._backlog)} requests are already waiting')
+
+            request_id = next(self._ids)
+            self._pending[request_id] = future
+            self._counters['submitted'] += 1
+
+            self._backlog.append((request_id, obj))
+            self._assign()
+
+        return future
+
+    def predict(self, obj: Any, timeout: float = None) -> Any:
+        return self.submit(obj).result(timeout)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        if self._dispatcher is None or self._closing.is_set():
+            return
+
+        self._closing.set()
+        deadline = default_timer() + timeout
+
+        # Let the workers finish the requests that were already submitted
+        with self._lock:
+            while self._pending and self._idle.wait(max(0.0, deadline - default_timer())):
+                pass
+
+            for worker in self._workers.values():
+                if not worker['closed']:
+                    try:
+                        worker['conn'].send(None)
+                    except (OSError, ValueError):
+                        pass
+
+        for worker in self._workers.values():
+            worker['process'].join(max(0.0, deadline - default_timer()))
+            if worker['process'].is_alive():
+                worker['process'].terminate()
+                worker['process'].join()
+
+        self._stopping.set()
+        self._dispatcher.join()
+
+        with self._lock:
+            for future in self._pending.values():
+                future.set_exception(RuntimeError('The server was stopped'))
+            self._pending.clear()
+            self._backlog.clear()
+
+        logger.info(f'Stopped {len(self._workers)} workers')
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def health(self) -> Dict[str, Any]:
+        with self._lock:
+            workers = {
+                worker_id: {
+                    'pid': worker['process'].pid,
+                    'alive': worker['process'].is_alive(),
+                    'ready': worker['ready'],
+                    'busy': worker['request'] is not None
+                }
+                for worker_id, worker in self._workers.items()
+            }
+
+        return {
+            'healthy': all(w['alive'] and w['ready'] for w in workers.values()),
+            'workers': workers
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            uptime = default_timer() - self._started if self._started else 0.0
+            busy_ms = sum(worker['busy_ms'] for worker in self._workers.values())
+            processed = sum(worker['requests'] for worker in self._workers.values())
+
+            return {
+                **self._counters,
+                'in_flight': len(self._pending),
+                'queued': len(self._backlog),
+                'uptime_secs': uptime,
+                'requests_per_sec': self._counters['completed'] / uptime if uptime else 0.0,
+                'rows_per_sec': self._counters['rows'] / uptime if uptime else 0.0,
+                'mean_latency_ms': busy_ms / processed if processed else 0.0,
+                'workers': {
+                    worker_id: {
+                        'requests': worker['requests'],
+                        'rows': worker['rows'],
+                        'busy_ms': worker['busy_ms']
+                    }
+                    for worker_id, worker in self._workers.items()
+                }
+            }
@@ -0,0 +1,80 @@
+import logging
+from typing import List, Tuple
+
+
+logger = logging.getLogger('tuning')
+
+
+class ChunkSizeTuner(object):
+    """
+    Picks the chunk size for chunked execution from measured throughput.
+    Starting at `initial` rows the size is doubled as long as the throughput
+    improves and a chunk's latency stays under `latency_target` (seconds),
+    after that it settles on the best size seen. The first `warmup` chunks
+    aren't used for tuning as they include one-off costs.
+    """
+    def __init__(
+            self,
+            initial: int = 1000,
+            min_size: int = 100,
+            max_size: int = 100000,
+            latency_target: float = None,
+            tolerance: float = 0.05,
+            warmup: int = 1
+    ):
+        self._size = max(min_size, min(initial, max_size))
+        self._min_size = min_size
+        self._max_size = max_size
+        self._latency_target = latency_target
+        self._tolerance = tolerance
+        self._warmup = warmup
+
+        self._best = (0.0, self._size)
+        self._settled = min_size == max_size
+        self._history = []
+
+    @classmethod
+    def fixed(cls, size: int) -> 'ChunkSizeTuner':
+        return cls(initial=size, min_size=size, max_size=size)
+
+    @property
+    def chunk_size(self) -> int:
+        return self._size
+
+    @property
+    def history(self) -> List[Tuple[int, float, float]]:
+        return self._history
+
+    def observe(self, rows: int, secs: float, latency: float) -> None:
+        """
+        Records that `rows` rows were processed in `secs` seconds of the
+        slowest stage, and passed through all stages in `latency` seconds.
+        """
+        throughput = rows / secs if secs > 0 else float('inf')
+        self._history.append((rows, throughput, latency))
+
+        # Chunks of another size were produced before the last adjustment,
+        # or are partial (e.g. the last one), and say nothing about this size
+        if len(self._history) <= self._warmup or rows != self._size:
+            return
+
+        if self._latency_target is not None and latency > self._latency_target:
+            if self._size > self._min_size:
+                self._size = max(self._min_size, self._size // 2)
+                self._best = (0.0, self._size)
+                logger.info(f'Latency {latency:.3f}s exceeds target, reduced chunk size to {self._size}')
+            self._settled = True
+            return
+
+        if self._settled:
+            return
+
+        if throughput > self._best[0] * (1 + self._tolerance):
+            self._best = (throughput, self._size)
+            if self._size < self._max_size:
+                self._size = min(self._max_size, self._size * 2)
+                return
+
+        self._size = self._best[1]
+        self._settled = True
+        logger.info(f'Settled on chunk size {self._size} ({int(self._best[0])} rows/s)')
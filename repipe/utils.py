@@ -1,6 +1,10 @@
 import logging
 from timeit import default_timer
 
+import numpy as np
+import pandas as pd
+from scipy.sparse import spmatrix
+
 logger = logging.getLogger('utils')
 
 
@@ -16,4 +20,15 @@ class Timer(object):
     def __exit__(self, *args):
         end = self.timer()
         self.elapsed_secs = end - self.start
-        self.elapsed = self.elapsed_secs * 1000  # millisecs
\ No newline at end of file
+        self.elapsed = self.elapsed_secs * 1000  # millisecs
+
+
+def take_rows(value, positions):
+    # Selects rows of a pipeline field, whatever container it is stored in
+    if isinstance(value, (pd.Series, pd.DataFrame)):
+        return value.iloc[positions]
+    elif isinstance(value, (np.ndarray, spmatrix)):
+        return value[positions]
+    elif isinstance(value, list):
+        return [value[i] for i in positions]
+    return value
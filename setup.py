@@ -17,9 +17,15 @@ setup(
         'nltk == 3.4.5',
         'numpy == 1.17.3',
         'pandas == 0.25.2',
+        'pyyaml == 5.1.2',
         'scikit-learn == 0.23.2',
         'scipy == 1.4.1',
     ],
+    entry_points={
+        'console_scripts': [
+            'repipe = repipe.cli:main'
+        ],
+    },
     extras_require={
         'test': [
             'pyyaml==5.1.2',
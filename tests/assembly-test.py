@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix, coo_matrix, hstack, issparse
+
+from repipe.pipeline import Pipeline, FeatureSelector
+from repipe.pipeline.assembly import assemble_dense, assemble_sparse
+
+
+def dense(m):
+    return m.toarray() if issparse(m) else np.asarray(m)
+
+
+def expected(parts, dtype):
+    # What callers did before, stacking and then casting
+    parts = [p if issparse(p) else csr_matrix(np.asarray(p)[:, None] if np.ndim(p) == 1 else p) for p in parts]
+    return hstack(parts).astype(dtype)
+
+
+def check(parts, dtype='float32'):
+    reference = expected(parts, dtype)
+
+    out = assemble_dense(parts, dtype)
+    assert out.dtype == np.dtype(dtype) and out.shape == reference.shape
+    assert np.array_equal(out, dense(reference))
+
+    out = assemble_sparse(parts, dtype)
+    assert issparse(out) and out.dtype == np.dtype(dtype) and out.shape == reference.shape
+    assert np.array_equal(out.toarray(), dense(reference))
+
+
+rng = np.random.RandomState(0)
+rows = 50
+sparse = csr_matrix(rng.binomial(1, 0.1, (rows, 30)) * rng.randint(1, 5, (rows, 30)))
+empty_rows = csr_matrix(np.vstack([np.zeros((rows // 2, 8)), rng.rand(rows - rows // 2, 8)]))
+dense_2d = rng.rand(rows, 4)
+dense_1d = rng.randint(0, 100, rows)
+series = pd.Series(rng.rand(rows))
+
+check([sparse, dense_2d, dense_1d, series, empty_rows])
+check([dense_2d, dense_1d], dtype='int64')
+check([sparse, sparse], dtype='float64')
+check([csr_matrix((rows, 0)), dense_2d])
+
+# Duplicate entries are summed, as hstack does, without touching the input
+duplicates = csr_matrix((np.array([1.0, 2.0, 3.0]), np.array([1, 1, 0]), np.array([0, 2, 3])), shape=(2, 3))
+check([duplicates, rng.rand(2, 2)])
+assert duplicates.nnz == 3 and not duplicates.has_canonical_format
+check([coo_matrix(([1.0, 2.0], ([0, 0], [2, 2])), shape=(2, 3)), rng.rand(2, 1)])
+
+# Batches without rows
+check([sparse[:0], dense_2d[:0], dense_1d[:0]])
+assert assemble_dense([dense_1d[:0], dense_2d[:0]]).shape == (0, 5)
+assert assemble_sparse([sparse[:0], dense_1d[:0]]).shape == (0, 31)
+
+try:
+    assemble_dense([dense_2d, dense_2d[:10]])
+    assert False
+except ValueError:
+    pass
+
+# A feature can only be in one group
+try:
+    FeatureSelector(features=['a', 'b', 'c'], layout=[{'features': ['a', 'b']}, {'features': ['b', 'c']}])
+    assert False
+except ValueError as e:
+    assert 'more than one group' in str(e)
+
+# The assembled matrices are counted by the plan, the selected fields aren't
+df = pd.DataFrame({'a': rng.rand(rows), 'b': rng.rand(rows), 'c': rng.rand(rows)})
+selector = FeatureSelector(features=['a', 'b', 'c'], layout=[{'features': ['a', 'b'], 'dtype': 'float64'}])
+assert selector.outputs == ['a+b', 'c']
+
+fields = {field.name: field for field in Pipeline(steps=[selector]).plan(df).fields}
+assert set(fields) == {'a', 'b', 'c', 'a+b'}
+assert fields['a+b'].shape == (2,) and fields['a+b'].bytes_per_row == 16
+
+fields = {field.name for field in Pipeline(steps=[FeatureSelector(features=['a', 'c'])]).plan(df).fields}
+assert fields == {'a', 'b', 'c'}
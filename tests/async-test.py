@@ -0,0 +1,129 @@
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from repipe.concurrency import AsyncRunner, Overloaded, default_runner
+from repipe.pipeline.base import Pipeline, TransformStep, FitTransformMixin
+
+
+class Doubler(FitTransformMixin):
+    inline = True
+
+    def transform(self, X):
+        return X * 2
+
+    @property
+    def params(self):
+        return {}
+
+
+def on_loop_thread():
+    return threading.current_thread() is threading.main_thread()
+
+
+pipe = Pipeline(steps=[TransformStep(out_field='doubled', in_fields=['x'], transform=Doubler())])
+df = pd.DataFrame({'x': [1, 2, 3]})
+
+
+async def transform():
+    out = await pipe.transform_async(df)
+    assert list(out['doubled']) == [2, 4, 6]
+
+
+# The default runner isn't shared between event loops
+asyncio.run(transform())
+asyncio.run(transform())
+
+
+async def inline_steps():
+    runner = AsyncRunner(inline_rows=1)
+    async with runner:
+        assert await runner.run(on_loop_thread, inline=True)
+        assert await runner.run(on_loop_thread, inline=True, rows=1)
+        # Inline steps over more than inline_rows rows leave the loop too
+        assert not await runner.run(on_loop_thread, inline=True, rows=2)
+        # Other steps always leave the loop, however few rows there are
+        assert not await runner.run(on_loop_thread, rows=1)
+        assert not await runner.run(on_loop_thread)
+
+asyncio.run(inline_steps())
+
+
+# Only the pipeline's cheap steps run on the loop
+class ThreadRecorder(FitTransformMixin):
+    def __init__(self, inline):
+        self.inline = inline
+        self.on_loop = None
+
+    def transform(self, X):
+        self.on_loop = on_loop_thread()
+        return X
+
+    @property
+    def params(self):
+        return {}
+
+
+async def pipeline_steps():
+    cheap, heavy = ThreadRecorder(inline=True), ThreadRecorder(inline=False)
+    steps = [
+        TransformStep(out_field='a', in_fields=['x'], transform=cheap),
+        TransformStep(out_field='b', in_fields=['x'], transform=heavy)
+    ]
+    await Pipeline(steps=steps).transform_async(df.iloc[:1], runner=AsyncRunner(inline_rows=1))
+    assert cheap.on_loop and not heavy.on_loop
+
+    await Pipeline(steps=steps).transform_async(df, runner=AsyncRunner(inline_rows=1))
+    assert not cheap.on_loop and not heavy.on_loop
+
+asyncio.run(pipeline_steps())
+
+
+async def timeout_keeps_slot():
+    runner = AsyncRunner(executor=ThreadPoolExecutor(2), max_concurrency=1, max_pending=0)
+    release = threading.Event()
+
+    async def request():
+        async with runner:
+            await runner.run(release.wait, rows=1)
+
+    try:
+        await asyncio.wait_for(request(), 0.05)
+        assert False
+    except asyncio.TimeoutError:
+        pass
+
+    # The step is still running in the executor, so its slot is still taken
+    assert runner.running == 1
+    try:
+        async with runner:
+            assert False
+    except Overloaded:
+        pass
+
+    release.set()
+    for _ in range(100):
+        if runner.running == 0:
+            break
+        await asyncio.sleep(0.01)
+    assert runner.running == 0
+
+    async with runner:
+        assert await runner.run(lambda: 1, rows=1) == 1
+
+asyncio.run(timeout_keeps_slot())
+
+
+# A runner moves to another loop once it's idle
+runner = AsyncRunner(max_concurrency=1)
+
+
+async def use_runner():
+    await asyncio.gather(*[pipe.transform_async(df, runner=runner) for _ in range(3)])
+    assert default_runner() is default_runner()
+
+asyncio.run(use_runner())
+asyncio.run(use_runner())
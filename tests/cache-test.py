@@ -0,0 +1,134 @@
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+import repipe.pipeline as pipeline
+from repipe.cache import PredictionCache
+from repipe.model import Model, ModelOutputMapper
+
+
+class FakeGraph(object):
+    @contextmanager
+    def as_default(self):
+        yield
+
+
+class FakeKerasModel(object):
+    # Scores each row from the sum of its token ids
+    output_names = ['label']
+    output_shape = (None, 2)
+
+    def __init__(self):
+        self.rows = 0
+
+    def predict(self, X, batch_size=None):
+        X = X[0]
+        self.rows += len(X)
+        p = (X.sum(axis=1) % 7 + 1) / 8
+        return np.stack([p, 1 - p], axis=1)
+
+
+def make_pipeline():
+    return pipeline.Pipeline(
+        steps=[
+            pipeline.TransformStep(
+                in_fields='text',
+                out_field='text_scrubbed',
+                transform=pipeline.TextScrubber(lower=True)
+            ),
+            pipeline.TransformStep(
+                in_fields='text_scrubbed',
+                out_field='tokenized',
+                transform=pipeline.KerasTokenizerAdapter(filters='')
+            ),
+            pipeline.TransformStep(
+                in_fields='tokenized',
+                out_field='padded_tokenized',
+                transform=pipeline.KerasPadSequencesAdapter(maxlen=10, padding='post', truncating='post', dtype='i4')
+            ),
+            pipeline.FeatureSelector(features=['padded_tokenized'])
+        ]
+    )
+
+
+def make_mapper(fallback_class='other'):
+    return ModelOutputMapper(
+        classes={
+            'label': [
+                {'class_id': 0, 'class_name': 'a', 'f1_score': 0.9, 'precision': 0.9, 'recall': 0.9, 'support': 10},
+                {'class_id': 1, 'class_name': 'b', 'f1_score': 0.8, 'precision': 0.8, 'recall': 0.8, 'support': 10}
+            ]
+        },
+        mean_f1=0.5,
+        fallback_class=fallback_class
+    )
+
+
+def make_model(pipe, cache=None):
+    model = Model(path='model.h5', pipeline=pipe, output_mapper=make_mapper(), lazy=True, cache=cache)
+    model._model = FakeKerasModel()
+    model._tf_graph = FakeGraph()
+    model._labeler = model._map_single
+    return model
+
+
+train = pd.DataFrame({'text': ['the quick brown fox', 'jumps over the lazy dog', 'a b c d e f']})
+df = pd.DataFrame({
+    'text': [
+        'The quick fox',
+        'the quick  fox',
+        'a lazy dog',
+        'The quick fox',
+        'over the brown dog',
+        'A LAZY DOG'
+    ]
+})
+
+pipe = make_pipeline()
+pipe.fit(train)
+
+# The steps up to the key field and the remaining ones give the full transform
+obj = pipe.transform_until(df, ['text_scrubbed'])
+assert 'text_scrubbed' in obj and 'tokenized' not in obj
+X = pipe.transform_from(obj, ['text_scrubbed'])
+assert np.array_equal(X[0], pipe.transform(df)[0])
+
+uncached = make_model(pipe)
+expected = uncached.predict(df)
+
+cache = PredictionCache(key_fields=['text_scrubbed'])
+cached = make_model(pipe, cache=cache)
+assert cached.predict(df) == expected
+
+# Only the first record of each distinct scrubbed text is predicted
+assert cached._model.rows == 3
+assert cache.stats()['misses'] == 6 and len(cache) == 3
+
+assert cached.predict(df) == expected
+assert cached._model.rows == 3
+assert cache.stats()['hits'] == 6
+
+# Partially cached batches only predict the new records
+more = pd.DataFrame({'text': ['a lazy dog', 'the brown fox', 'The brown fox']})
+assert cached.predict(more) == uncached.predict(more)
+assert cached._model.rows == 4
+
+# Refitting the pipeline invalidates the cache
+config_hash = cached.config_hash
+pipe.fit(pd.DataFrame({'text': ['dog fox lazy quick over brown the a']}))
+assert cached.config_hash != config_hash
+assert cached.predict(df) == uncached.predict(df)
+assert cache.stats()['invalidations'] == 1
+assert cached._model.rows == 7
+
+# So does replacing the output mapper
+cached._mapper = make_mapper(fallback_class='none')
+cached.predict(df)
+assert cache.stats()['invalidations'] == 2
+
+# Without key fields records are keyed on the input fields
+cache = PredictionCache()
+cached = make_model(pipe, cache=cache)
+assert cached.predict(df) == uncached.predict(df)
+assert cached._model.rows == 5
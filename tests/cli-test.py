@@ -0,0 +1,102 @@
+import io
+import os
+import json
+import tempfile
+from contextlib import redirect_stdout, redirect_stderr
+
+import joblib
+import pandas as pd
+import yaml
+
+import repipe.pipeline as pipeline
+from repipe.cli import main, parse_args, shard_units, unit_name, SUCCESS_MARKER
+
+
+def run(argv):
+    out, err = io.StringIO(), io.StringIO()
+    with redirect_stdout(out), redirect_stderr(err):
+        code = main(argv)
+    return code, out.getvalue(), err.getvalue()
+
+
+# Every input belongs to exactly one shard, whatever the order of the inputs
+paths = [f'data/{i}.csv' for i in range(10)]
+shards = [shard_units(paths, i, 3) for i in range(3)]
+assert sorted(sum(shards, [])) == sorted(paths)
+assert shard_units(list(reversed(paths)), 1, 3) == shards[1]
+assert unit_name('a/x.csv') != unit_name('b/x.csv')
+
+for argv in (['-w', '0'], ['--shard-index', '2', '--shard-count', '2']):
+    try:
+        with redirect_stderr(io.StringIO()):
+            parse_args(['transform', 'pipe.yaml', 'in.csv', '-o', 'out'] + argv)
+        assert False
+    except SystemExit as e:
+        assert e.code == 2
+
+pipe = pipeline.Pipeline(
+    steps=[
+        pipeline.TransformStep(
+            in_fields=['short_description', 'description'],
+            out_field='text',
+            transform=pipeline.TextFieldUnion()
+        )
+    ]
+)
+
+with tempfile.TemporaryDirectory() as tmp:
+    pipe_path = os.path.join(tmp, 'pipe.yaml')
+    with open(pipe_path, 'w') as f:
+        yaml.safe_dump(pipe.to_dict(), f)
+
+    df = pd.DataFrame({
+        'short_description': [f'short {i}' for i in range(25)],
+        'description': [f'long {i}' for i in range(25)]
+    })
+    csv_path = os.path.join(tmp, 'tickets.csv')
+    jsonl_path = os.path.join(tmp, 'tickets.jsonl')
+    broken_path = os.path.join(tmp, 'broken.csv')
+    df.to_csv(csv_path, index=False)
+    df.to_json(jsonl_path, orient='records', lines=True)
+    df[['description']].to_csv(broken_path, index=False)
+
+    output = os.path.join(tmp, 'out')
+    inputs = [csv_path, jsonl_path, broken_path]
+
+    # Parts left behind by an interrupted run are removed
+    stale = os.path.join(output, unit_name(csv_path), 'part-00009.joblib')
+    os.makedirs(os.path.dirname(stale))
+    open(stale, 'w').close()
+
+    code, out, err = run(['transform', pipe_path, *inputs, '-o', output, '-w', '2', '--chunk-rows', '10'])
+    assert code == 1
+    assert '3 inputs, 0 already done, 3 to transform' in out
+    assert 'broken.csv failed' in err and 'KeyError' in err
+
+    for path in (csv_path, jsonl_path):
+        unit_dir = os.path.join(output, unit_name(path))
+        assert sorted(os.listdir(unit_dir)) == [SUCCESS_MARKER, 'part-00000.joblib', 'part-00001.joblib', 'part-00002.joblib']
+        with open(os.path.join(unit_dir, SUCCESS_MARKER)) as f:
+            assert json.load(f)['rows'] == 25
+
+        parts = [joblib.load(os.path.join(unit_dir, f'part-{i:05d}.joblib')) for i in range(3)]
+        assert [len(part['text']) for part in parts] == [10, 10, 5]
+        assert parts[2]['text'].tolist()[-1] == 'short 24 . long 24'
+
+    assert not os.path.exists(os.path.join(output, unit_name(broken_path), SUCCESS_MARKER))
+
+    # Finished inputs are skipped when the command is run again, failed ones are retried
+    code, out, err = run(['transform', pipe_path, *inputs, '-o', output, '-w', '2'])
+    assert code == 1
+    assert '3 inputs, 2 already done, 1 to transform' in out
+    assert 'broken.csv failed' in err
+
+    # Each shard only transforms its own inputs
+    sharded = os.path.join(tmp, 'sharded')
+    for index in range(2):
+        code, out, err = run([
+            'transform', pipe_path, csv_path, jsonl_path, '-o', sharded, '--shard-index', str(index), '--shard-count', '2'
+        ])
+        assert code == 0
+        assert '1 inputs, 0 already done, 1 to transform' in out
+    assert len(os.listdir(sharded)) == 2
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+
+import repipe.pipeline as pipeline
+
+
+series = pd.Series([
+    '2020-01-03 10:15:30.123456',
+    None,
+    '2020-01-03 10:15:30.123456',
+    '2021-12-31 23:59:00.000000',
+    'not a date'
+])
+
+# Several parts in one pass, missing and unparseable values are -1
+X = pipeline.DateTimePartsExtractor(
+    parts=['year', 'month', 'dayofweek', 'hour', 'microsecond'],
+    format='%Y-%m-%d %H:%M:%S.%f'
+).transform(series)
+
+assert X.dtype == np.int32
+assert X.tolist() == [
+    [2020, 1, 4, 10, 123456],
+    [-1, -1, -1, -1, -1],
+    [2020, 1, 4, 10, 123456],
+    [2021, 12, 4, 23, 0],
+    [-1, -1, -1, -1, -1]
+]
+
+# Same parts as the single part extractor
+hours = pipeline.DateTimePartExtractor('hour').transform(pd.Series(['2020-01-03 10:00', '2021-12-31 23:59']))
+assert pipeline.DateTimePartsExtractor(['hour']).transform(pd.Series(['2020-01-03 10:00', '2021-12-31 23:59']))[:, 0].tolist() == hours.tolist()
+
+# Parts that don't fit the dtype are rejected
+for parts, dtype in [(['microsecond'], 'int16'), (['year'], 'int8'), (['hour'], 'uint8')]:
+    try:
+        pipeline.DateTimePartsExtractor(parts, dtype=dtype)
+        assert False
+    except ValueError:
+        pass
+
+# Cyclical encoding, sin/cos pairs per part and zeros for missing values
+X = pipeline.DateTimePartsExtractor(
+    parts=['hour', 'month'],
+    format='%Y-%m-%d %H:%M:%S.%f',
+    cyclical=True
+).transform(series)
+
+hour = 2 * np.pi * 10 / 24
+month = 2 * np.pi * (1 - 1) / 12
+assert X.dtype == np.float32
+assert X.shape == (5, 4)
+assert np.allclose(X[0], [np.sin(hour), np.cos(hour), np.sin(month), np.cos(month)], atol=1e-6)
+assert np.array_equal(X[0], X[2])
+assert not X[1].any() and not X[4].any()
+assert np.allclose(X[:, 0] ** 2 + X[:, 1] ** 2, [1, 0, 1, 1, 0], atol=1e-6)
+
+for kwargs in [{'parts': ['year'], 'cyclical': True}, {'parts': ['hour'], 'cyclical': True, 'dtype': 'int32'}]:
+    try:
+        pipeline.DateTimePartsExtractor(**kwargs)
+        assert False
+    except ValueError:
+        pass
@@ -0,0 +1,76 @@
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import repipe.pipeline as pipeline
+from repipe.pipeline.base import FusedTransformStep
+from repipe.serializeable import Serializable
+
+
+def make_pipe():
+    return pipeline.Pipeline(
+        fuse=True,
+        steps=[
+            pipeline.TransformStep(
+                in_fields=['short_description', 'description'],
+                out_field='text',
+                transform=pipeline.TextFieldUnion()
+            ),
+            pipeline.TransformStep(
+                in_fields='text',
+                out_field='hashed',
+                transform=pipeline.KerasTextHasher(hash_slots=1000)
+            ),
+            pipeline.TransformStep(
+                in_fields='hashed',
+                out_field='padded_hashed',
+                transform=pipeline.KerasPadSequencesAdapter(maxlen=10, padding='post', truncating='post', dtype='i4')
+            ),
+            pipeline.FeatureSelector(features=['padded_hashed'])
+        ]
+    )
+
+
+def make_df(seed, rows=3000):
+    words = np.array(['printer', 'broken', 'vpn', 'down', 'login', 'floor', 'again', 'mail'])
+    rng = np.random.RandomState(seed)
+    return pd.DataFrame({
+        'short_description': [' '.join(rng.choice(words, 3)) for _ in range(rows)],
+        'description': [' '.join(rng.choice(words, 6)) for _ in range(rows)]
+    })
+
+
+fused = make_pipe()
+frames = [make_df(seed) for seed in range(4)]
+
+# Fused steps are run in-process by default
+assert FusedTransformStep.n_jobs == 1
+expected = [fused.transform(df)[0] for df in frames]
+
+FusedTransformStep.n_jobs = 4
+
+# Concurrent transforms don't see each other's columns
+with ThreadPoolExecutor(4) as executor:
+    for _ in range(3):
+        results = list(executor.map(lambda df: fused.transform(df)[0], frames))
+        assert all(np.array_equal(X1, X2) for X1, X2 in zip(results, expected))
+
+
+# Daemonic processes (e.g. serving and CLI workers) can't fork, they run the pass in-process
+def transform_in_daemon(queue):
+    queue.put(fused.transform(frames[0])[0])
+
+ctx = multiprocessing.get_context('fork')
+queue = ctx.Queue()
+process = ctx.Process(target=transform_in_daemon, args=(queue,), daemon=True)
+process.start()
+assert np.array_equal(queue.get(timeout=60), expected[0])
+process.join()
+
+FusedTransformStep.n_jobs = 1
+
+# The fuse flag survives saving and loading
+assert Serializable.load(fused.to_dict()).to_dict() == fused.to_dict()
+assert fused.to_dict()['instance']['params']['fuse'] is True
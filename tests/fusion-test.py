@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+
+import repipe.pipeline as pipeline
+
+
+def make_pipe(fuse):
+    return pipeline.Pipeline(
+        fuse=fuse,
+        steps=[
+            pipeline.TransformStep(
+                in_fields=['short_description', 'description'],
+                out_field='text',
+                transform=pipeline.TextFieldUnion()
+            ),
+            pipeline.TransformStep(
+                in_fields='text',
+                out_field='text_scrubbed',
+                transform=pipeline.TextScrubber(
+                    lower=True,
+                    tokenize=False
+                )
+            ),
+            pipeline.TransformStep(
+                in_fields='text_scrubbed',
+                out_field='tokenized',
+                transform=tokenizer
+            ),
+            pipeline.TransformStep(
+                in_fields='tokenized',
+                out_field='padded_tokenized',
+                transform=pipeline.KerasPadSequencesAdapter(
+                    maxlen=20,
+                    padding='post',
+                    truncating='post',
+                    value=0,
+                    dtype='i4'
+                )
+            ),
+            pipeline.FeatureSelector(
+                features=[
+                    'padded_tokenized'
+                ]
+            )
+        ]
+    )
+
+
+df = pd.DataFrame({
+    'short_description': ['Printer broken', None, 'VPN down since 10:45'],
+    'description': ['The printer on floor 3 is (again) broken.', 'Cannot log in', None]
+})
+
+tokenizer = pipeline.KerasTokenizerAdapter(filters='')
+tokenizer.fit(pipeline.TextScrubber(lower=True).transform(
+    pipeline.TextFieldUnion().transform(df.short_description, df.description)
+))
+
+fused = make_pipe(fuse=True)
+unfused = make_pipe(fuse=False)
+
+# The whole text chain collapses into a single fused step
+plan = fused._plan(fused._steps, keep=set())
+assert [type(step).__name__ for step in plan] == ['FusedTransformStep', 'FeatureSelector']
+
+for rows in [df, pd.concat([df] * 1000, ignore_index=True)]:
+    X1 = fused.transform(rows)
+    X2 = unfused.transform(rows)
+    assert len(X1) == len(X2) == 1
+    assert X1[0].dtype == X2[0].dtype
+    assert np.array_equal(X1[0], X2[0])
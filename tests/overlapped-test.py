@@ -0,0 +1,115 @@
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+import repipe.pipeline as pipeline
+from repipe.pipeline.base import FitTransformMixin
+from repipe.model import Model
+from repipe.tuning import ChunkSizeTuner
+
+
+class Identity(FitTransformMixin):
+    def transform(self, X):
+        if (X == -1).any():
+            raise ValueError('bad row')
+        return X.values.reshape(-1, 1).astype('float32')
+
+    @property
+    def params(self):
+        return {}
+
+
+class FakeGraph(object):
+    @contextmanager
+    def as_default(self):
+        yield
+
+
+class FakeKerasModel(object):
+    def __init__(self):
+        self.batch_sizes = []
+
+    def predict(self, X, batch_size=None):
+        X = X[0]
+        self.batch_sizes.append(batch_size)
+        if (X == -2).any():
+            raise RuntimeError('bad batch')
+        return X * 2
+
+
+def make_model():
+    pipe = pipeline.Pipeline(
+        steps=[
+            pipeline.TransformStep(in_fields='x', out_field='features', transform=Identity()),
+            pipeline.FeatureSelector(features=['features'])
+        ]
+    )
+    model = Model(path='model.h5', pipeline=pipe, output_mapper=None, lazy=True)
+    model._model = FakeKerasModel()
+    model._tf_graph = FakeGraph()
+    model._labeler = lambda Y: {'out': [float(y) for y in Y[:, 0]]}
+    return model
+
+
+df = pd.DataFrame({'x': np.arange(2500)})
+expected = {'out': [2.0 * x for x in range(2500)]}
+
+# Chunks are labeled in order, whatever their size
+model = make_model()
+assert model.predict_overlapped(df, chunk_size=300) == expected
+assert model.predict_overlapped(df, latency_target=10.0) == expected
+assert model.predict_overlapped(df, tuner=ChunkSizeTuner(initial=100, min_size=100, max_size=800)) == expected
+
+# The model's batch size doesn't follow the chunk size
+model = make_model()
+assert model.predict_overlapped(df, chunk_size=2500) == expected
+assert model._model.batch_sizes == [1000]
+model.predict_overlapped(df, chunk_size=2500, batch_size=64)
+assert model._model.batch_sizes[-1] == 64
+
+# An empty frame gives the same result as predict
+empty = df.iloc[:0]
+assert model.predict_overlapped(empty) == model.predict(empty) == {'out': []}
+
+# Errors of any stage are raised to the caller
+for bad in (-1, -2):
+    failing = df.copy()
+    failing.loc[1800, 'x'] = bad
+    try:
+        make_model().predict_overlapped(failing, chunk_size=300)
+        assert False
+    except (ValueError, RuntimeError) as e:
+        assert 'bad' in str(e)
+
+
+# The chunk size is doubled while the throughput improves...
+def secs(rows):
+    # Fixed overhead per chunk, which stops paying off beyond 1600 rows
+    return 0.1 + rows * 0.001 + max(0, rows - 1600) * 0.01
+
+tuner = ChunkSizeTuner(initial=100, min_size=100, max_size=100000, warmup=1)
+for _ in range(20):
+    size = tuner.chunk_size
+    tuner.observe(size, secs(size), secs(size))
+assert tuner.chunk_size == 1600
+
+# ...but the first chunks and partial chunks don't count
+tuner = ChunkSizeTuner(initial=100, warmup=2)
+tuner.observe(100, 1.0, 1.0)
+tuner.observe(100, 1.0, 1.0)
+tuner.observe(50, 0.001, 0.001)
+assert tuner.chunk_size == 100
+tuner.observe(100, 1.0, 1.0)
+assert tuner.chunk_size == 200
+
+# The size is halved once the latency exceeds the target
+tuner = ChunkSizeTuner(initial=1000, min_size=100, latency_target=0.5, warmup=0)
+tuner.observe(1000, 1.0, 1.0)
+assert tuner.chunk_size == 500
+tuner.observe(500, 0.6, 0.6)
+assert tuner.chunk_size == 250
+tuner.observe(250, 0.1, 0.1)
+assert tuner.chunk_size == 250
+
+assert ChunkSizeTuner.fixed(300).chunk_size == 300
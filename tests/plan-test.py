@@ -0,0 +1,83 @@
+import io
+import os
+import time
+import tempfile
+from contextlib import redirect_stdout
+
+import numpy as np
+import pandas as pd
+import yaml
+
+import repipe.pipeline as pipeline
+from repipe.cli import main
+from repipe.pipeline.base import FitTransformMixin
+
+
+class Widen(FitTransformMixin):
+    # Four float64 columns per row, and slow enough to be measured
+    def transform(self, X):
+        time.sleep(0.02)
+        return np.repeat(X.values[:, None], 4, axis=1).astype('float64')
+
+    @property
+    def params(self):
+        return {}
+
+
+class Narrow(FitTransformMixin):
+    def transform(self, X):
+        return X.values.astype('float32')
+
+    @property
+    def params(self):
+        return {}
+
+
+pipe = pipeline.Pipeline(
+    steps=[
+        pipeline.TransformStep(in_fields='x', out_field='wide', transform=Widen()),
+        pipeline.TransformStep(in_fields='x', out_field='narrow', transform=Narrow()),
+        pipeline.FeatureSelector(features=['wide', 'narrow'])
+    ]
+)
+
+rows = 1000
+df = pd.DataFrame({'x': np.arange(rows, dtype='int64')})
+x_bytes = df.x.memory_usage(deep=True) / rows
+
+plan = pipe.plan(df, n_rows=100 * rows, memory_budget=2**20)
+fields = {field.name: field for field in plan.fields}
+assert set(fields) == {'x', 'wide', 'narrow'}
+assert fields['wide'].shape == (4,) and fields['wide'].dtype == 'float64' and fields['wide'].bytes_per_row == 32
+assert fields['narrow'].shape == () and fields['narrow'].bytes_per_row == 4
+assert abs(plan.bytes_per_row - (x_bytes + 36)) < 1e-9
+
+# Memory and time are extrapolated linearly from the sample
+assert plan.peak_bytes == int(plan.bytes_per_row * 100 * rows)
+steps = {step.name: step for step in plan.steps}
+assert list(steps) == ['wide', 'narrow', 'FeatureSelector']
+assert steps['wide'].secs_per_row >= 0.02 / rows
+assert abs(plan.secs - sum(step.secs_per_row for step in plan.steps) * 100 * rows) < 1e-9
+assert plan.secs >= 2.0
+
+# The chunk size is the number of rows that fits in the budget
+assert plan.chunk_size == int(2**20 // plan.bytes_per_row)
+assert plan.recommend_chunk_size(2**30) == 100 * rows
+assert plan.recommend_chunk_size(10) == 1
+assert pipe.plan(df).recommend_chunk_size() == rows
+
+# The plan command prints the same plan for a sample of an input file
+with tempfile.TemporaryDirectory() as tmp:
+    pipe_path = os.path.join(tmp, 'pipe.yaml')
+    with open(pipe_path, 'w') as f:
+        yaml.safe_dump(pipe.to_dict(), f)
+    csv_path = os.path.join(tmp, 'data.csv')
+    pd.DataFrame({'x': np.arange(5000)}).to_csv(csv_path, index=False)
+
+    out = io.StringIO()
+    with redirect_stdout(out):
+        assert main(['plan', pipe_path, csv_path, '-n', '100000', '--sample-rows', '1000', '--memory-budget', '1M']) == 0
+
+    out = out.getvalue()
+    assert 'Plan for 100000 rows (sampled 1000)' in out
+    assert f'Recommended chunk size for 1.0 MB: {plan.chunk_size} rows' in out
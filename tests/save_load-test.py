@@ -53,4 +53,6 @@ with open(f'my_pipe.yaml', 'r') as f:
 print(pipe.to_dict())
 print()
 print(pipe2.to_dict())
-assert pipe.to_dict() == pipe2.to_dict()
\ No newline at end of file
+assert pipe.to_dict() == pipe2.to_dict()
+# Pipelines that aren't fused serialize as before
+assert 'fuse' not in pipe.to_dict()['instance']['params']
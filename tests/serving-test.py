@@ -0,0 +1,152 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+import repipe.pipeline as pipeline
+from repipe.model import Model
+from repipe.pipeline.base import FitTransformMixin
+from repipe.serving import ModelServer
+
+
+class DoublingModel(object):
+    def predict(self, obj):
+        if obj == ['fail']:
+            raise ValueError('fail')
+        if obj == ['exit']:
+            os._exit(1)
+        if obj == ['sleep']:
+            time.sleep(0.01)
+            return obj
+        return [x * 2 for x in obj]
+
+
+with ModelServer(DoublingModel(), workers=2) as server:
+    futures = [server.submit([i, i + 1]) for i in range(50)]
+    assert [f.result(10) for f in futures] == [[2 * i, 2 * i + 2] for i in range(50)]
+
+    # Errors raised by the model are reported back to the caller
+    try:
+        server.predict(['fail'], timeout=10)
+        assert False
+    except RuntimeError as e:
+        assert 'ValueError' in str(e)
+
+    # A worker that dies fails its request and is restarted
+    try:
+        server.predict(['exit'], timeout=10)
+        assert False
+    except RuntimeError as e:
+        assert 'died' in str(e)
+
+    time.sleep(1)
+    assert server.health()['healthy']
+    assert server.predict([1], timeout=10) == [2]
+
+    stats = server.stats()
+    assert stats['completed'] == 51
+    assert stats['failed'] == 2
+    assert stats['restarts'] == 1
+    assert stats['rows'] == 101
+
+
+# Dead workers are noticed while other requests keep coming in
+with ModelServer(DoublingModel(), workers=2) as server:
+    stop = threading.Event()
+
+    def load():
+        while not stop.is_set():
+            assert server.predict(['sleep'], timeout=10) == ['sleep']
+
+    threads = [threading.Thread(target=load) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+
+    try:
+        started = time.time()
+        try:
+            server.predict(['exit'], timeout=10)
+            assert False
+        except RuntimeError as e:
+            assert 'died' in str(e)
+        assert time.time() - started < 5
+
+        # Healthy again while the load continues
+        for _ in range(50):
+            if server.health()['healthy']:
+                break
+            time.sleep(0.1)
+        assert server.health()['healthy']
+        assert server.stats()['restarts'] == 1
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+    assert server.stats()['in_flight'] == 0
+
+
+# A lazy Model loads its Keras session in each worker, not in the parent
+class AsColumn(FitTransformMixin):
+    def transform(self, X):
+        return X.values.reshape(-1, 1).astype('float32')
+
+    @property
+    def params(self):
+        return {}
+
+
+class FakeGraph(object):
+    @contextmanager
+    def as_default(self):
+        yield
+
+
+class FakeKerasModel(object):
+    def predict(self, X, batch_size=None):
+        return X[0] * 2
+
+
+class FakeLoadingModel(Model):
+    # Stands in for load_model, which would load the Keras model from `path`
+    def load_model(self):
+        self._model = FakeKerasModel()
+        self._tf_graph = FakeGraph()
+        self._loaded_in = os.getpid()
+        self._labeler = lambda Y: {
+            'out': [float(y) for y in Y[:, 0]],
+            'loaded_in': [self._loaded_in] * len(Y),
+            'pid': [os.getpid()] * len(Y)
+        }
+
+
+pipe = pipeline.Pipeline(
+    steps=[
+        pipeline.TransformStep(in_fields='x', out_field='features', transform=AsColumn()),
+        pipeline.FeatureSelector(features=['features'])
+    ]
+)
+model = FakeLoadingModel(path='model.h5', pipeline=pipe, output_mapper=None, lazy=True)
+
+with ModelServer(model, workers=2) as server:
+    pids = set()
+    for _ in range(20):
+        result = server.predict(pd.DataFrame({'x': np.arange(3)}), timeout=10)
+        assert result['out'] == [0.0, 2.0, 4.0]
+        assert result['loaded_in'] == result['pid']
+        pids.update(result['pid'])
+    assert os.getpid() not in pids
+    assert server.health()['healthy']
+
+assert not model.is_loaded
+
+# A model that is loaded already would share its session with the workers
+model.load_model()
+try:
+    ModelServer(model, workers=2)
+    assert False
+except ValueError as e:
+    assert 'lazy=True' in str(e)